@@ -0,0 +1,564 @@
+"""
+
+ Benchmarks + correctness corpus for the idx line parsers, and an offline suite
+ over a synthetic EDGAR corpus served by a local SEC stand-in.
+
+    python -m <package>.benchmarks                      # line parsers only
+    python -m <package>.benchmarks --suite              # + parse_idx_day / parse / classify / subsidiaries
+    python -m <package>.benchmarks --suite --years 30 --source full --save base.json
+    python -m <package>.benchmarks --suite --compare base.json --tolerance 0.2
+
+ Suite benchmarks run in a fresh (spawned) process each, so the reported peak RSS
+ is the benchmark's own. Same arguments -> same corpus -> comparable numbers.
+
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from .columnar import HAS_PYARROW, IdxColumnarSink
+from .edgar_cache import CLOSE_GRACE_DAYS, ListingCache, quarter_end
+from .entity_classification import ENTS
+from .entity_db import EntityDB
+from .instrumentation import RunStats
+from .name_index import NameIndex, normalize
+from .parser_EFT import EFTsQuery
+from .parser_IDX import IdxColumns, ParserIDX, iter_idx_records, parse_idx_columns
+from .sec_stand_in import SECStandIn, StandInRequest, SyntheticEdgar, company_idx
+
+
+def parse_idx_line_resplit(line: str) -> dict:
+    """ the original re.split parser - kept as the baseline to beat """
+
+    if not line.strip():
+        return {}
+
+    parts = re.split(r'\s{2,}', line.strip())
+
+    return {
+        "form_type": parts[1],
+        "company_raw": parts[0],
+        "cik": parts[2],
+        "date_filed": parts[-2],
+        "file_name": parts[-1]
+    }
+
+
+# (company, form type, cik) -- names that break whitespace splitting one way or another
+AWKWARD_NAMES = [
+
+    # ===== inner double spaces (SEC pads the state / ADV suffixes) =====
+    ("SENTRY MANAGEMENT INC          /ADV", "ADV", "1000097"),
+    ("WINDWARD CAPITAL MANAGEMENT CO  /CA", "13F-HR", "1009207"),
+    ("STEPHENS INC  /AR/", "X-17A-5", "1047286"),
+    ("A  B", "4", "1"),
+
+    # ===== names that look like other columns =====
+    ("1 800 FLOWERS COM INC", "10-Q", "1084869"),
+    ("2020 HOLDINGS  LLC", "D", "1800001"),
+    ("FUND 4", "N-MFP2", "1400004"),
+    ("20240102 TRUST", "10-K", "1900001"),
+
+    # ===== form types with spaces / amendments =====
+    ("GOLDMAN SACHS GROUP INC", "SC 13G/A", "886982"),
+    ("ACME ACQUISITION CORP", "425", "1888888"),
+    ("BERKSHIRE HATHAWAY INC", "SCHEDULE 13D/A", "1067983"),    # wider than its 12 char column
+
+    # ===== width edge cases =====
+    ("X" * 60, "8-K", "1234567"),
+    ("T. Rowe Price Macro & Absolute Return Strategies Offshore Fu", "N-2", "1999999"),
+    ("Q", "D", "9"),
+
+    # ===== non-ascii =====
+    ("Nestlé Holdings, Inc.", "FWP", "1000275"),
+    ("SOCIÉTÉ GÉNÉRALE", "424B2", "1238163"),
+
+]
+
+
+def _line(company, form_type, cik, date="20240102"):
+    file_name = f"edgar/data/{cik}/0000000000-24-000001.txt"
+    return f"{company[:60]:<62}{form_type:<11} {cik:<11} {date:<11} {file_name}"
+
+
+def _triple(parsed):
+    return (parsed["company_raw"], parsed["form_type"], parsed["cik"]) if parsed else None
+
+
+def check_awkward_names():
+    """ runs the corpus through every parser, returns {parser: [failed companies]} """
+
+    body = company_idx([(c, f, k, f"edgar/data/{k}/0000000000-24-000001.txt") for c, f, k in AWKWARD_NAMES], "20240102")
+    head = body.split("\n----")[0].rsplit("\n", 1)[-1]
+    columns = IdxColumns(head)
+
+    failed = {"re.split": [], "loose": [], "columns": [], "stream": [], "batch": []}
+
+    streamed = list(iter_idx_records(body))
+    batch = parse_idx_columns(body.encode("utf-8"))
+
+    for i, (company, form_type, cik) in enumerate(AWKWARD_NAMES):
+        expected = (company[:60], form_type, cik)
+        line = _line(company, form_type, cik)
+
+        try:
+            legacy = parse_idx_line_resplit(line)
+        except IndexError:
+            legacy = {}
+
+        got = {
+            "re.split": _triple(legacy),
+            "loose": _triple(ParserIDX.parse_idx_line(line)),
+            "columns": _triple(ParserIDX.parse_idx_line(line, columns)),
+            "stream": streamed[i][:3] if i < len(streamed) else None,
+            "batch": (batch["company"][i], batch["form_type"][i], str(batch["cik"][i])) if i < len(batch["cik"]) else None,
+        }
+
+        for parser, value in got.items():
+            if value != expected:
+                failed[parser].append(company)
+
+    return failed
+
+
+def check_listing_grace():
+    """
+
+     A quarter listed the day after it ended must be revalidated, not frozen:
+     {case: (got, expected)} for a listing fetched day 1 / after the grace days
+
+    """
+
+    listings = ListingCache(tempfile.mkdtemp(), ttl=0)
+    end = quarter_end(2024, 1)
+    day_one = listings.put(2024, 1, ["company.20240328.idx"], today=end + datetime.timedelta(days=1))
+    settled = listings.put(2024, 1, ["company.20240328.idx"], today=end + datetime.timedelta(days=CLOSE_GRACE_DAYS + 1))
+
+    return {
+        "day 1 closed": (day_one["closed"], False),
+        "day 1 fresh": (listings.is_fresh(day_one), False),
+        "after grace closed": (settled["closed"], True),
+        "after grace fresh": (listings.is_fresh(settled), True),
+    }
+
+
+def check_entity_db_moves():
+    """ a CIK reclassified between upserts ends up in one table only: {case: (got, expected)} """
+
+    with EntityDB(":memory:") as db:
+        db.upsert([(2, "JOHN SMITH", "Person", None)])
+        db.upsert([(2, "JOHN SMITH", ("is_ria",), None)])
+        to_company = db.counts()
+
+        db.upsert([(2, "JOHN SMITH", "Person", None)])
+        to_person = db.counts()
+
+    return {
+        "Person -> Company": ((to_company["Company"], to_company["Person"]), (1, 0)),
+        "Company -> Person": ((to_person["Company"], to_person["Person"]), (0, 1)),
+    }
+
+
+SEARCH_MS = 1.0        # NameIndex.search latency target
+
+
+def check_name_search(sizes=(20_000, 200_000), n=300, seed=3):
+    """
+
+     NameIndex.search over the names of a synthetic filer universe, one typo per
+     query: {entries: (ms per query, share of queries that found the name)}
+     -- the target is < SEARCH_MS at every size
+
+    """
+
+    out = {}
+
+    for size in sizes:
+        corpus = SyntheticEdgar(entities=size)
+        index = NameIndex.from_records((cik, [name] + ([later] if later else [])) for cik, _, name, later in corpus.entities)
+
+        rnd = random.Random(seed)
+        queries = []
+
+        for _ in range(n):
+            key = index.keys[rnd.randrange(len(index))]
+            i = rnd.choice([i for i, c in enumerate(key) if c != " "])
+            queries.append((key[:i] + rnd.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ".replace(key[i], "")) + key[i + 1:], key))
+
+        index.search(queries[0][0])
+        t = time.perf_counter()
+        results = [index.search(query) for query, _ in queries]
+        ms = (time.perf_counter() - t) / n * 1e3
+
+        found = sum(any(normalize(name) == key for _, name, _ in r) for r, (_, key) in zip(results, queries))
+        out[len(index)] = (ms, found / n)
+
+    return out
+
+
+def synthetic_lines(n, seed=7):
+    """ n realistic-ish data lines (ascii, some double-spaced names) """
+
+    rnd = random.Random(seed)
+    words = ["CAPITAL", "PARTNERS", "HOLDINGS", "FUND", "TRUST", "SMITH", "JOHN", "GLOBAL", "ENERGY", "BANCORP"]
+    suffixes = ["INC", "LLC", "LP", "CORP", "/ADV", "/DE/", ""]
+    forms = ["4", "8-K", "10-Q", "D", "SC 13G/A", "424B2", "13F-HR", "N-MFP2", "ADV"]
+
+    out = []
+    for _ in range(n):
+        name = " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 4)))
+        suffix = rnd.choice(suffixes)
+        sep = "          " if suffix.startswith("/") and rnd.random() < 0.3 else " "
+        out.append(_line(f"{name}{sep}{suffix}".strip(), rnd.choice(forms), str(rnd.randint(1000, 2000000))))
+
+    return out
+
+
+def bench_parse_idx_line(n=200_000):
+    """ lines / second of each parser over the same n lines """
+
+    lines = synthetic_lines(n)
+    body = company_idx([], "20240102") + "\n".join(lines) + "\n"
+    columns = IdxColumns(body.split("\n----")[0].rsplit("\n", 1)[-1])
+    raw = body.encode("utf-8")
+
+    def timed(fn):
+        t = time.perf_counter()
+        fn()
+        return n / (time.perf_counter() - t)
+
+    return {
+        "re.split (baseline)": timed(lambda: [parse_idx_line_resplit(l) for l in lines]),
+        "parse_idx_line (loose)": timed(lambda: [ParserIDX.parse_idx_line(l) for l in lines]),
+        "parse_idx_line (columns)": timed(lambda: [ParserIDX.parse_idx_line(l, columns) for l in lines]),
+        "iter_idx_records": timed(lambda: list(iter_idx_records(body))),
+        "parse_idx_columns (batch)": timed(lambda: parse_idx_columns(raw)),
+    }
+
+
+# ---------- offline suite
+
+def _peak_rss_mb():
+    try:
+        # high water mark of this process image only (ru_maxrss survives fork + exec on linux)
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _isolated(job):
+    """ runs in the spawned process: (result dict + peak rss) """
+
+    fn, kwargs = job
+    result = fn(**kwargs)
+    result["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def _point_at(base):
+    ParserIDX.BASE = base
+    ParserIDX.request_cls = StandInRequest
+    EFTsQuery.BASE = f"{base}LATEST/search-index?"
+    EFTsQuery.request_cls = StandInRequest
+
+
+def check_resume(base, start, end, cache_dir, stop_after=10, incremental=False):
+    """
+
+     Stops a checkpointed run with an IdxColumnarSink after `stop_after` idx files,
+     continues it in a fresh parser and reads the tables back:
+
+        {"filings": (rows, expected), "entities": (rows, expected)}
+
+     expected == what the finished store holds. incremental=True continues with
+     parse(incremental=True) instead of a plain resume.
+
+    """
+
+    import pyarrow.parquet as pq
+
+    _point_at(base)
+    checkpoint = os.path.join(cache_dir, "resume.ckpt")
+    out = os.path.join(cache_dir, "resume")
+
+    ParserIDX(start, end, rate=1000, cache_dir=cache_dir, checkpoint=checkpoint,
+              sinks=[IdxColumnarSink(out)]).parse(safety=stop_after)
+
+    parser = ParserIDX(start, end, rate=1000, cache_dir=cache_dir, checkpoint=checkpoint, sinks=[IdxColumnarSink(out)])
+    store = parser.parse(safety=None, incremental=incremental)
+
+    expected = sum(len(store.filings(cik)) for cik in store.iter_ciks())
+
+    return {
+        "filings": (pq.read_metadata(os.path.join(out, "filings.parquet")).num_rows, expected),
+        "entities": (pq.read_metadata(os.path.join(out, "entities.parquet")).num_rows, len(store)),
+    }
+
+
+def bench_parse_idx_day(base, start, end, cache_dir, days=20):
+    """ parse_idx_day over the first `days` idx files -- network + parse, cold cache """
+
+    _point_at(base)
+    parser = ParserIDX(start, end, rate=1000, cache_dir=cache_dir, stats=RunStats())
+    n = min(days, len(parser.links))
+
+    t = time.perf_counter()
+    for enum in range(n):
+        parser.parse_idx_day(enum)
+    seconds = time.perf_counter() - t
+
+    lines = parser.stats.counters.get("lines", 0)
+    return {"throughput": lines / seconds, "unit": "lines/s", "seconds": seconds, "files": n}
+
+
+def bench_parse(base, start, end, cache_dir, source="daily", workers=4, processes=None):
+    """ ParserIDX.parse() end to end (listing, fetch, parse, classify) """
+
+    _point_at(base)
+    parser = ParserIDX(start, end, workers=workers, rate=1000, cache_dir=cache_dir, source=source, stats=RunStats())
+
+    t = time.perf_counter()
+    parser.parse(safety=None, processes=processes)
+    seconds = time.perf_counter() - t
+
+    lines = parser.stats.counters.get("lines", 0)
+    return {
+        "throughput": lines / seconds, "unit": "lines/s", "seconds": seconds,
+        "entities": len(parser.small_db), "stages": parser.stats.summary()["stages"],
+    }
+
+
+def _corpus_pairs(corpus_args, n):
+    """ n (name, forms) pairs drawn from the synthetic universe with its own form mix """
+
+    corpus = SyntheticEdgar(**corpus_args)
+    rnd = random.Random(11)
+    pairs = []
+
+    for _ in range(n):
+        _, kind, name, _ = corpus.entities[corpus._pick(rnd)]
+        forms = [f for f, _ in corpus.FORMS[kind]]
+        pairs.append((name, rnd.sample(forms, rnd.randint(1, min(4, len(forms))))))
+
+    return pairs
+
+
+def bench_classify(corpus_args, n=50_000):
+    """ EntityClassifier.classify, one call per (name, forms) """
+
+    pairs = _corpus_pairs(corpus_args, n)
+
+    t = time.perf_counter()
+    for name, forms in pairs:
+        ENTS.classify(name, forms=forms)
+    seconds = time.perf_counter() - t
+
+    return {"throughput": n / seconds, "unit": "classify/s", "seconds": seconds}
+
+
+def bench_classify_many(corpus_args, n=50_000):
+    """ EntityClassifier.classify_many over the same pairs """
+
+    pairs = _corpus_pairs(corpus_args, n)
+
+    t = time.perf_counter()
+    ENTS.classify_many(pairs)
+    seconds = time.perf_counter() - t
+
+    return {"throughput": n / seconds, "unit": "classify/s", "seconds": seconds}
+
+
+def bench_subsidiaries(base, start, end, workers=4):
+    """ EFTsQuery.subsidiaries() over the EFTS stand-in """
+
+    _point_at(base)
+    query = EFTsQuery(start=start, end=end, stats=RunStats(), workers=workers, rate=1000)
+
+    t = time.perf_counter()
+    query.subsidiaries()
+    seconds = time.perf_counter() - t
+
+    hits = query.stats.counters.get("hits", 0)
+    return {"throughput": hits / seconds, "unit": "hits/s", "seconds": seconds, "requests": query.stats.counters.get("requests", 0)}
+
+
+SUITE = ("parse_idx_day", "parse", "classify", "classify_many", "subsidiaries")
+
+
+def run_suite(years=1, end=None, filings_per_day=2000, entities=40_000, source="daily",
+              workers=4, processes=None, only=None, latency=0.0):
+    """
+
+     Builds the synthetic corpus (years up to `end`, default last closed year),
+     serves it from a local SECStandIn and runs every benchmark in its own process.
+
+     Returns {benchmark: {"throughput", "unit", "seconds", "peak_rss_mb", ...}}
+
+    """
+
+    end = end or datetime.date.today().year - 1
+    start = end - years + 1
+    corpus_args = dict(start=start, end=end, filings_per_day=filings_per_day, entities=entities)
+    corpus = SyntheticEdgar(**corpus_args)
+
+    results = {}
+
+    with SECStandIn(corpus, latency=latency) as sec:
+        base = sec.base_url
+
+        jobs = {
+            "parse_idx_day": (bench_parse_idx_day, dict(base=base, start=start, end=end, cache_dir=tempfile.mkdtemp())),
+            "parse": (bench_parse, dict(base=base, start=start, end=end, cache_dir=tempfile.mkdtemp(),
+                                        source=source, workers=workers, processes=processes)),
+            "classify": (bench_classify, dict(corpus_args=corpus_args)),
+            "classify_many": (bench_classify_many, dict(corpus_args=corpus_args)),
+            "subsidiaries": (bench_subsidiaries, dict(base=base, start=start, end=end, workers=workers)),
+        }
+
+        for name in SUITE:
+            if only and name not in only:
+                continue
+
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                results[name] = pool.submit(_isolated, jobs[name]).result()
+
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """ [(benchmark, metric, baseline, now)] that got worse by more than tolerance """
+
+    regressions = []
+
+    for name, now in results.items():
+        then = baseline.get(name)
+        if not then:
+            continue
+
+        if now["throughput"] < then["throughput"] * (1 - tolerance):
+            regressions.append((name, now["unit"], then["throughput"], now["throughput"]))
+
+        if now["peak_rss_mb"] > then["peak_rss_mb"] * (1 + tolerance):
+            regressions.append((name, "peak_rss_mb", then["peak_rss_mb"], now["peak_rss_mb"]))
+
+    return regressions
+
+
+if __name__ == "__main__":
+
+    args = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    args.add_argument("--suite", action="store_true", help="run the offline suite too")
+    args.add_argument("--years", type=int, default=1)
+    args.add_argument("--end", type=int, default=None, help="last corpus year (default: last closed year)")
+    args.add_argument("--filings-per-day", type=int, default=2000)
+    args.add_argument("--entities", type=int, default=40_000)
+    args.add_argument("--source", choices=ParserIDX.SOURCES, default="daily")
+    args.add_argument("--workers", type=int, default=4)
+    args.add_argument("--processes", type=int, default=None)
+    args.add_argument("--latency", type=float, default=0.0, help="seconds per stand-in request")
+    args.add_argument("--only", nargs="*", choices=SUITE)
+    args.add_argument("--save", help="write the suite results to this json file")
+    args.add_argument("--compare", help="baseline json of an earlier --save")
+    args.add_argument("--tolerance", type=float, default=0.2)
+    args = args.parse_args()
+
+    print("=" * 70)
+    print("AWKWARD NAMES")
+    print("=" * 70)
+
+    for parser, failed in check_awkward_names().items():
+        status = "✓" if not failed else "✗"
+        print(f"{status} {parser:10} {len(AWKWARD_NAMES) - len(failed)}/{len(AWKWARD_NAMES)}")
+        for company in failed:
+            print(f"      {company}")
+
+    print("=" * 70)
+    print("LISTING CACHE")
+    print("=" * 70)
+
+    for case, (got, expected) in check_listing_grace().items():
+        print(f"{'✓' if got == expected else '✗'} {case:20} {got}")
+
+    print("=" * 70)
+    print("ENTITY DB")
+    print("=" * 70)
+
+    for case, (got, expected) in check_entity_db_moves().items():
+        print(f"{'✓' if got == expected else '✗'} {case:20} Company / Person rows {got}")
+
+    print("=" * 70)
+    print("NAME SEARCH")
+    print("=" * 70)
+
+    for entries, (ms, recall) in check_name_search((20_000, 200_000, 1_000_000) if args.suite else (20_000, 200_000)).items():
+        print(f"{'✓' if ms < SEARCH_MS else '✗'} {entries:>10,} entries {ms:>7.3f} ms / query   found {recall:.1%}")
+
+    print("=" * 70)
+    print("LINES / SECOND")
+    print("=" * 70)
+
+    for parser, rate in bench_parse_idx_line().items():
+        print(f"{parser:30} {rate:>12,.0f}")
+
+    if not args.suite:
+        sys.exit(0)
+
+    if HAS_PYARROW:
+        print("=" * 70)
+        print("RESUME")
+        print("=" * 70)
+
+        corpus = SyntheticEdgar(start=args.end or datetime.date.today().year - 1, filings_per_day=200, entities=5000)
+
+        with SECStandIn(corpus) as sec:
+            for incremental in (False, True):
+                checked = check_resume(sec.base_url, corpus.start, corpus.end, tempfile.mkdtemp(), incremental=incremental)
+
+                for table, (rows, expected) in checked.items():
+                    status = "✓" if rows == expected else "✗"
+                    print(f"{status} {'incremental' if incremental else 'resume':12} {table:10} {rows}/{expected}")
+
+    results = run_suite(
+        years=args.years, end=args.end, filings_per_day=args.filings_per_day, entities=args.entities,
+        source=args.source, workers=args.workers, processes=args.processes, only=args.only, latency=args.latency,
+    )
+
+    print("=" * 70)
+    print(f"SUITE ({args.years} years, {args.filings_per_day} filings / day)")
+    print("=" * 70)
+
+    for name, r in results.items():
+        print(f"{name:16} {r['throughput']:>14,.0f} {r['unit']:12} {r['seconds']:>9.2f}s {r['peak_rss_mb']:>9.1f} MB")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+
+        for name, metric, then, now in regressions:
+            print(f"✗ REGRESSION {name} {metric}: {then:,.1f} -> {now:,.1f}")
+
+        if regressions:
+            sys.exit(1)
+
+        print(f"✓ no regression beyond {args.tolerance:.0%}")
@@ -0,0 +1,377 @@
+"""
+
+ Columnar (Parquet / Arrow IPC) export of the parser results.
+
+ Tables:
+
+    entities              cik, original_name, entity ("Company" | "Person" | null), flags
+    names                 cik, name, original -- one row per name a CIK filed under
+    filings               cik, form_type, filed (YYYYMMDD), accession
+    subsidiary_exhibits   filer, cik, joint, accession, file_name -- one row per CIK of the filer
+    subsidiaries          cik, accession, file_name, name, jurisdiction, ownership -- EX-21 rows, see exhibits.py
+
+ form types / entities / flags are dictionary encoded. Writers buffer one row group
+ and flush it, so nothing bigger than a row group is held besides the parser's own state.
+
+ Streaming while parsing:
+
+    sink = IdxColumnarSink("out/")            # or "out/" + fmt="arrow"
+    ParserIDX(2024, 2025, sinks=[sink]).parse()
+    # filings are written as they are found, entities + names once classified
+
+    EFTsQuery(2024, 2025, sinks=[ExhibitColumnarSink("out/subsidiary_exhibits.parquet")]).subsidiaries()
+
+"""
+
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+
+except ImportError:
+    HAS_PYARROW = False
+
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _require_pyarrow():
+    if not HAS_PYARROW:
+        raise Exception("columnar export requires the pyarrow package")
+
+
+def _dict(index=None):
+    return pa.dictionary(index or pa.int32(), pa.string())
+
+
+def entities_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ("cik", pa.int64()),
+        ("original_name", pa.string()),
+        ("entity", _dict(pa.int8())),
+        ("flags", pa.list_(pa.string())),
+    ])
+
+
+def names_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ("cik", pa.int64()),
+        ("name", pa.string()),
+        ("original", pa.bool_()),
+    ])
+
+
+def filings_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ("cik", pa.int64()),
+        ("form_type", _dict(pa.int16())),
+        ("filed", pa.int32()),
+        ("accession", pa.string()),
+    ])
+
+
+def subsidiary_exhibits_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ("filer", pa.string()),             # the snapshot json key: "cik" or "cik1_cik2"
+        ("cik", pa.int64()),
+        ("joint", pa.bool_()),
+        ("accession", pa.string()),
+        ("file_name", pa.string()),
+    ])
+
+
+def subsidiaries_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ("cik", pa.int64()),
+        ("accession", pa.string()),
+        ("file_name", pa.string()),
+        ("name", pa.string()),
+        ("jurisdiction", _dict()),
+        ("ownership", pa.float64()),
+    ])
+
+
+class ColumnarWriter:
+    """
+
+     Row-appending writer for one table, flushed in row groups.
+
+     Dictionary columns take plain strings, the codes are kept here so every row
+     group shares one growing dictionary (Arrow IPC gets it as dictionary deltas).
+     The file is written next to path and renamed on close() -- readers never see half a table.
+
+    """
+
+    def __init__(self, path, schema, fmt=None, row_group_size=65_536):
+        """
+        Args:
+            path: target file
+            schema: one of the *_schema() above (or any flat pyarrow schema)
+            fmt: "parquet" | "arrow" -- default from the extension, parquet otherwise
+            row_group_size: rows buffered before a flush
+        """
+
+        _require_pyarrow()
+
+        if fmt is None:
+            fmt = "arrow" if os.path.splitext(path)[1] in (".arrow", ".feather", ".ipc") else "parquet"
+
+        if fmt not in FORMATS:
+            raise Exception(f"fmt must be one of {tuple(FORMATS)}, got: {fmt}")
+
+        self.path = path
+        self.schema = schema
+        self.fmt = fmt
+        self.row_group_size = row_group_size
+        self.rows = 0
+
+        self._columns = [[] for _ in schema]
+        self._dictionaries = {
+            i: ({}, []) for i, field in enumerate(schema) if pa.types.is_dictionary(field.type)
+        }
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self._tmp = os.path.join(folder, f".tmp-{os.path.basename(path)}")
+
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(self._tmp, schema, compression="zstd")
+        else:
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            self._writer = pa.ipc.new_file(self._tmp, schema, options=options)
+
+    def append(self, *row):
+        for i, value in enumerate(row):
+            lookup = self._dictionaries.get(i)
+
+            if lookup is not None and value is not None:
+                codes, values = lookup
+                code = codes.get(value)
+
+                if code is None:
+                    code = codes[value] = len(values)
+                    values.append(value)
+
+                value = code
+
+            self._columns[i].append(value)
+
+        if len(self._columns[0]) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        n = len(self._columns[0])
+        if not n:
+            return
+
+        arrays = []
+
+        for i, field in enumerate(self.schema):
+            if i in self._dictionaries:
+                indices = pa.array(self._columns[i], type=field.type.index_type)
+                dictionary = pa.array(self._dictionaries[i][1], type=field.type.value_type)
+                arrays.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+            else:
+                arrays.append(pa.array(self._columns[i], type=field.type))
+
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+        if self.fmt == "parquet":
+            self._writer.write_batch(batch, row_group_size=n)
+        else:
+            self._writer.write_batch(batch)
+
+        self.rows += n
+        self._columns = [[] for _ in self.schema]
+
+    def close(self):
+        if self._writer is None:
+            return
+
+        self.flush()
+        self._writer.close()
+        self._writer = None
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        """ drop the unfinished file """
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _split_entity(ent):
+    """ ENTS result -> (entity, flags): flag tuples are Company regimes """
+
+    if isinstance(ent, (tuple, list)):
+        return "Company", list(ent)
+
+    return ent, None
+
+
+def _append_entities(w, store):
+    for row, cik in enumerate(store.ciks):
+        entity, flags = _split_entity(store.entities[store.entity_codes[row]])
+        w.append(cik, store.names[store.name_ids[row]], entity, flags)
+
+
+def _append_names(w, store):
+    for row, cik in enumerate(store.ciks):
+        w.append(cik, store.names[store.name_ids[row]], True)
+
+        for nid in store.other.get(row, ()):
+            w.append(cik, store.names[nid], False)
+
+
+def write_entities(store, path, fmt=None, row_group_size=65_536):
+    """ entities table of an EntityStore (ParserIDX.small_db) """
+
+    with ColumnarWriter(path, entities_schema(), fmt, row_group_size) as w:
+        _append_entities(w, store)
+
+    return w.rows
+
+
+def write_names(store, path, fmt=None, row_group_size=65_536):
+    """ names table of an EntityStore -- original name first, then the other names """
+
+    with ColumnarWriter(path, names_schema(), fmt, row_group_size) as w:
+        _append_names(w, store)
+
+    return w.rows
+
+
+def write_filings(store, path, fmt=None, row_group_size=65_536):
+    """ filings table of an EntityStore (first filing per CIK and form type) """
+
+    with ColumnarWriter(path, filings_schema(), fmt, row_group_size) as w:
+        for cik in store.iter_ciks():
+            for form_type, filed, accs in store.filings(cik):
+                w.append(cik, form_type, filed, accs)
+
+    return w.rows
+
+
+def export_entity_store(store, folder, fmt="parquet", row_group_size=65_536):
+    """ entities / names / filings tables into folder, returns {table: path} """
+
+    ext = FORMATS.get(fmt, "")
+    paths = {t: os.path.join(folder, f"{t}{ext}") for t in ("entities", "names", "filings")}
+
+    write_entities(store, paths["entities"], fmt, row_group_size)
+    write_names(store, paths["names"], fmt, row_group_size)
+    write_filings(store, paths["filings"], fmt, row_group_size)
+
+    return paths
+
+
+def _exhibit_rows(key, doc_id):
+    """ EFTsQuery key (cik str or tuple of them) + "0001193125-24-286982:d898161dex211.htm" -> rows """
+
+    ciks = key if isinstance(key, tuple) else (key,)
+    filer = "_".join(ciks)
+    accs, _, file_name = doc_id.partition(":")
+
+    for cik in ciks:
+        yield filer, int(cik), len(ciks) > 1, accs, file_name or None
+
+
+def write_subsidiary_exhibits(small_db, path, fmt=None, row_group_size=65_536):
+    """ EFTsQuery.small_db ({cik | (cik, ...): [_id, ...]}) -> subsidiary_exhibits table """
+
+    with ColumnarWriter(path, subsidiary_exhibits_schema(), fmt, row_group_size) as w:
+        for key, ids in small_db.items():
+            for doc_id in ids:
+                for row in _exhibit_rows(key, doc_id):
+                    w.append(*row)
+
+    return w.rows
+
+
+def write_subsidiaries(rows, path, fmt=None, row_group_size=65_536):
+    """ exhibits.SubsidiaryRow stream (ExhibitDownloader.subsidiaries) -> subsidiaries table """
+
+    with ColumnarWriter(path, subsidiaries_schema(), fmt, row_group_size) as w:
+        for row in rows:
+            w.append(*row)
+
+    return w.rows
+
+
+class IdxColumnarSink:
+    """
+
+     ParserIDX sink (see ParserIDX.sinks):
+
+        add_filing()    -- every kept filing, straight into the filings table
+        add_entities()  -- classified CIKs (the whole store, or chunk by chunk when spilled)
+        close()         -- finishes the three files
+
+    """
+
+    def __init__(self, folder, fmt="parquet", row_group_size=65_536):
+        _require_pyarrow()
+
+        ext = FORMATS.get(fmt, "")
+
+        self.folder = folder
+        self.fmt = fmt
+        self.row_group_size = row_group_size
+        self.paths = {t: os.path.join(folder, f"{t}{ext}") for t in ("entities", "names", "filings")}
+        self.filings = ColumnarWriter(self.paths["filings"], filings_schema(), fmt, row_group_size)
+        self.entities = ColumnarWriter(self.paths["entities"], entities_schema(), fmt, row_group_size)
+        self.names = ColumnarWriter(self.paths["names"], names_schema(), fmt, row_group_size)
+
+    def add_filing(self, cik, form_type, filed, accs):
+        if isinstance(filed, str):
+            filed = int(filed.replace("-", ""))
+
+        self.filings.append(cik, form_type, filed, accs)
+
+    def add_entities(self, store):
+        _append_entities(self.entities, store)
+        _append_names(self.names, store)
+
+    def close(self, parser=None):
+        for w in (self.filings, self.entities, self.names):
+            w.close()
+
+
+class ExhibitColumnarSink:
+    """ EFTsQuery sink -- one subsidiary_exhibits row per hit (and CIK) of file_types as the pages come in """
+
+    def __init__(self, path, fmt=None, row_group_size=65_536, file_types=("EX-21.1",)):
+        self.writer = ColumnarWriter(path, subsidiary_exhibits_schema(), fmt, row_group_size)
+        self.file_types = set(file_types)
+
+    def add_exhibit(self, key, doc_id, file_type="EX-21.1"):
+        if file_type not in self.file_types:
+            return
+
+        for row in _exhibit_rows(key, doc_id):
+            self.writer.append(*row)
+
+    def close(self, query=None):
+        self.writer.close()
@@ -0,0 +1,310 @@
+"""
+
+ On-disk caches for the EDGAR archive trees.
+
+ ListingCache -- daily-index directory listings (year / quarter -> idx file names)
+ IndexCache   -- raw (immutable) company*.idx bodies, compressed + content-addressed
+
+"""
+
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+
+except ImportError:
+    HAS_ZSTD = False
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "palmy", "edgar")
+
+
+def atomic_write(path, data: bytes):
+    """ write to a temp file in the same dir and rename -- readers never see half a file """
+
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def current_quarter(today=None):
+    """ (year, quarter) of today -- the only quarter whose listing can still change """
+
+    today = today or datetime.date.today()
+    return today.year, (today.month - 1) // 3 + 1
+
+
+# EDGAR can publish the last day's daily idx and the full-index files a few days after quarter end
+CLOSE_GRACE_DAYS = 7
+
+
+def quarter_end(year, quarter):
+    return datetime.date(year, 3 * quarter, (31, 30, 30, 31)[quarter - 1])
+
+
+def is_closed_quarter(year, quarter, today=None):
+    """ over for at least CLOSE_GRACE_DAYS -- its listing / full index won't change anymore """
+
+    today = today or datetime.date.today()
+    return (today - quarter_end(year, quarter)).days > CLOSE_GRACE_DAYS
+
+
+class ListingCache:
+    """
+
+     One small json file per year / quarter:
+        {"links": [...], "etag": ..., "last_modified": ..., "fetched": ts, "closed": bool}
+
+     - closed quarters were listed more than CLOSE_GRACE_DAYS after they ended,
+       so they are kept forever
+     - the open quarter is reused for `ttl` seconds, afterwards revalidated with
+       If-None-Match / If-Modified-Since (a 304 just refreshes the timestamp)
+
+    """
+
+    def __init__(self, cache_dir=None, ttl=3600):
+        self.folder = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "listings")
+        self.ttl = ttl
+
+    def _path(self, year, quarter):
+        return os.path.join(self.folder, f"{year}-QTR{quarter}.json")
+
+    def get(self, year, quarter):
+        """ returns the cached entry (dict) or None """
+
+        try:
+            with open(self._path(year, quarter), "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, year, quarter, links, etag=None, last_modified=None, today=None):
+        entry = {
+            "links": links,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched": time.time(),
+            # only trust it forever if the quarter was over (+ grace) when we listed it --
+            # until then it is revalidated like the open one, and touch() freezes it later
+            "closed": is_closed_quarter(year, quarter, today),
+        }
+
+        atomic_write(self._path(year, quarter), json.dumps(entry).encode("utf-8"))
+        return entry
+
+    def touch(self, year, quarter, entry):
+        """ 304 Not Modified -- same links, new timestamp """
+
+        return self.put(year, quarter, entry["links"], entry.get("etag"), entry.get("last_modified"))
+
+    def is_fresh(self, entry):
+        """ fresh == usable without any request """
+
+        if entry.get("closed"):
+            return True
+
+        return time.time() - entry.get("fetched", 0) < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+
+class CacheMiss(Exception):
+    """ raised in cache_only mode when a body is not on disk """
+    pass
+
+
+class IndexCache:
+    """
+
+     Content-addressed store for raw index bodies:
+
+        objects/ab/abcdef....zst|.gz   -- compressed body, named by sha256 of the raw bytes
+        refs/<sha1(url)>              -- "<sha256> <codec>" pointing at the object
+
+     - identical bodies (e.g. re-published days) are stored once
+     - every write goes to a temp file + rename, so parallel workers / processes
+       can share one folder without locks
+     - reads bump the object's mtime; once the folder passes max_bytes the least
+       recently used objects are evicted down to 90% of the cap
+
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=4 * 1024 ** 3, codec=None):
+        """
+        Args:
+            cache_dir: root folder (default ~/.cache/palmy/edgar)
+            max_bytes: size cap of the compressed objects, None == unbounded
+            codec: "zstd" | "gzip" -- default zstd if zstandard is installed
+        """
+
+        root = cache_dir or DEFAULT_CACHE_DIR
+
+        self.objects = os.path.join(root, "objects")
+        self.refs = os.path.join(root, "refs")
+        self.max_bytes = max_bytes
+        self.codec = codec or ("zstd" if HAS_ZSTD else "gzip")
+
+        if self.codec == "zstd" and not HAS_ZSTD:
+            raise Exception("codec='zstd' requires the zstandard package")
+
+        self._size = None           # lazily counted on the first put()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _ref_name(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _object_path(self, digest, codec):
+        ext = "zst" if codec == "zstd" else "gz"
+        return os.path.join(self.objects, digest[:2], f"{digest}.{ext}")
+
+    def _compress(self, body):
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=10).compress(body)
+        return gzip.compress(body, compresslevel=6)
+
+    def _read_ref(self, url):
+        try:
+            with open(os.path.join(self.refs, self._ref_name(url)), "r") as f:
+                digest, codec = f.read().split()
+                return digest, codec
+        except (OSError, ValueError):
+            return None
+
+    def __contains__(self, url):
+        ref = self._read_ref(url)
+        return bool(ref) and os.path.exists(self._object_path(*ref))
+
+    def open(self, url):
+        """ binary file object streaming the decompressed body, or None """
+
+        ref = self._read_ref(url)
+        if not ref:
+            return None
+
+        path = self._object_path(*ref)
+
+        try:
+            if ref[1] == "zstd":
+                f = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+            else:
+                f = gzip.open(path, "rb")
+        except FileNotFoundError:
+            # evicted -- drop the dangling ref
+            try:
+                os.remove(os.path.join(self.refs, self._ref_name(url)))
+            except OSError:
+                pass
+            return None
+
+        try:
+            os.utime(path)      # LRU bookkeeping
+        except OSError:
+            pass
+
+        return f
+
+    def get(self, url):
+        """ raw bytes or None """
+
+        f = self.open(url)
+        if f is None:
+            return None
+
+        with f:
+            return f.read()
+
+    def put(self, url, body: bytes, encoded=None):
+        """
+
+         encoded="gzip": body is already gzip (e.g. full-index company.gz) and is
+         stored as is -- addressed by the digest of the compressed bytes then
+
+        """
+
+        codec = "gzip" if encoded == "gzip" else self.codec
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest, codec)
+
+        if not os.path.exists(path):
+            blob = body if encoded == "gzip" else self._compress(body)
+            atomic_write(path, blob)
+            self._grow(len(blob))
+
+        atomic_write(os.path.join(self.refs, self._ref_name(url)), f"{digest} {codec}".encode("ascii"))
+        return digest
+
+    def _scan(self):
+        """ [(mtime, size, path)] of all objects """
+
+        out = []
+
+        for folder, _, names in os.walk(self.objects):
+            for n in names:
+                if n.startswith(".tmp-"):
+                    continue
+                p = os.path.join(folder, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, p))
+
+        return out
+
+    def _grow(self, n):
+        if not self.max_bytes:
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._scan())
+            else:
+                self._size += n
+
+            if self._size > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target):
+        # rescan -- other processes may have written / evicted in the meantime
+        objects = sorted(self._scan())
+        size = sum(s for _, s, _ in objects)
+
+        for _, s, p in objects:
+            if size <= target:
+                break
+            try:
+                os.remove(p)
+            except OSError:
+                continue
+            size -= s
+
+        self._size = size
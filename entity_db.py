@@ -0,0 +1,247 @@
+"""
+
+ Local SQLite sink for classified ParserIDX output -- the library version of
+ init_historic_entities_by_idx in TIPS.md, without one get() / save() per CIK.
+
+ Tables (named after the models of the sketch):
+
+    Company                       cik, company_name_raw, flags ("is_fpi,is_mmf" - sorted, merged on upsert)
+    Person                        cik, original_full_name
+    FilerAwaitingClassification   cik, name -- ENTS returned None, see resolve_pending()
+    OtherName                     cik, name -- every other name a CIK filed under
+
+ A whole store goes in with one transaction: rows land in a temp table and every
+ table is updated by one set-based statement (existing CIKs are found by the
+ primary key join, not by lookups).
+
+    db = EntityDB("entities.sqlite")
+    ParserIDX(2024, 2025, sinks=[db]).parse()      # or db.upsert_store(parser.small_db)
+    db.resolve_pending()
+
+"""
+
+import sqlite3
+
+# dummy / fake import
+from .entity_classification import ENTS
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS Company (
+    cik INTEGER PRIMARY KEY,
+    company_name_raw TEXT,
+    flags TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS Person (
+    cik INTEGER PRIMARY KEY,
+    original_full_name TEXT
+);
+CREATE TABLE IF NOT EXISTS FilerAwaitingClassification (
+    cik INTEGER PRIMARY KEY,
+    name TEXT
+);
+CREATE TABLE IF NOT EXISTS OtherName (
+    cik INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (cik, name)
+) WITHOUT ROWID;
+"""
+
+
+def _merge_flags(old, new):
+    """ "is_fpi" + "is_mmf,is_fpi" -> "is_fpi,is_mmf" """
+
+    if not new:
+        return old or ""
+
+    if not old:
+        return new
+
+    return ",".join(sorted(set(old.split(",")) | set(new.split(","))))
+
+
+def _kind(ent):
+    """ ENTS result -> (table kind, flags string) -- flag tuples are Companies (see INDICATORS in TIPS.md) """
+
+    if isinstance(ent, (tuple, list)):
+        return "Company", ",".join(sorted(set(ent)))
+
+    if ent in ("Company", "Person"):
+        return ent, ""
+
+    return None, ""
+
+
+class EntityDB:
+    """ see module doc -- also usable as a ParserIDX sink (add_filing / add_entities / close) """
+
+    BATCH = 50_000      # rows per executemany
+
+    def __init__(self, path, classifier=None):
+        """
+        Args:
+            path: sqlite file (":memory:" works too)
+            classifier: used by resolve_pending(), default ENTS
+        """
+
+        self.path = path
+        self.classifier = classifier or ENTS
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.create_function("merge_flags", 2, _merge_flags, deterministic=True)
+            self._conn.executescript(SCHEMA)
+
+        return self._conn
+
+    # ------------------------------------------------------------- writes
+
+    def upsert(self, rows):
+        """
+
+         rows: iterable of (cik, name, entity, other_names), entity as returned by ENTS
+
+         - Person: inserted if new, an existing row is kept
+         - Company: inserted if new, otherwise the flags are merged in
+         - None: FilerAwaitingClassification, unless the CIK is classified already
+         - classified CIKs leave FilerAwaitingClassification, and the Company / Person
+           table they no longer belong to (reclassified between runs)
+
+         Returns {"new": n, "existing": n, "pending": n}
+
+        """
+
+        conn = self.conn
+
+        with conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (cik INTEGER PRIMARY KEY, name TEXT, kind TEXT, flags TEXT)")
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming_names (cik INTEGER, name TEXT)")
+            conn.execute("DELETE FROM incoming")
+            conn.execute("DELETE FROM incoming_names")
+
+            batch, names = [], []
+
+            for cik, name, ent, other_names in rows:
+                kind, flags = _kind(ent)
+                batch.append((int(cik), name, kind, flags))
+                names.extend((int(cik), n) for n in other_names or ())
+
+                if len(batch) >= self.BATCH:
+                    conn.executemany("INSERT OR REPLACE INTO incoming VALUES (?, ?, ?, ?)", batch)
+                    batch = []
+
+            conn.executemany("INSERT OR REPLACE INTO incoming VALUES (?, ?, ?, ?)", batch)
+            conn.executemany("INSERT INTO incoming_names VALUES (?, ?)", names)
+
+            existing = conn.execute("""
+                SELECT count(*) FROM incoming i
+                WHERE i.cik IN (SELECT cik FROM Company)
+                   OR i.cik IN (SELECT cik FROM Person)
+                   OR i.cik IN (SELECT cik FROM FilerAwaitingClassification)
+            """).fetchone()[0]
+            total = conn.execute("SELECT count(*) FROM incoming").fetchone()[0]
+
+            # a CIK lives in one table -- Person <-> Company moves drop the old row
+            conn.execute("""
+                DELETE FROM Person
+                WHERE cik IN (SELECT cik FROM incoming WHERE kind = 'Company')
+            """)
+            conn.execute("""
+                DELETE FROM Company
+                WHERE cik IN (SELECT cik FROM incoming WHERE kind = 'Person')
+            """)
+            conn.execute("""
+                INSERT INTO Company (cik, company_name_raw, flags)
+                SELECT cik, name, flags FROM incoming WHERE kind = 'Company'
+                ON CONFLICT (cik) DO UPDATE SET flags = merge_flags(Company.flags, excluded.flags)
+            """)
+            conn.execute("""
+                INSERT OR IGNORE INTO Person (cik, original_full_name)
+                SELECT cik, name FROM incoming WHERE kind = 'Person'
+            """)
+            conn.execute("""
+                INSERT OR IGNORE INTO FilerAwaitingClassification (cik, name)
+                SELECT cik, name FROM incoming
+                WHERE kind IS NULL
+                  AND cik NOT IN (SELECT cik FROM Company)
+                  AND cik NOT IN (SELECT cik FROM Person)
+            """)
+            conn.execute("""
+                DELETE FROM FilerAwaitingClassification
+                WHERE cik IN (SELECT cik FROM incoming WHERE kind IS NOT NULL)
+            """)
+            conn.execute("INSERT OR IGNORE INTO OtherName (cik, name) SELECT cik, name FROM incoming_names")
+
+        pending = conn.execute("SELECT count(*) FROM FilerAwaitingClassification").fetchone()[0]
+
+        return {"new": total - existing, "existing": existing, "pending": pending}
+
+    def upsert_store(self, store):
+        """ a whole EntityStore (ParserIDX.small_db) in one transaction """
+
+        rows = (
+            (cik, store.names[store.name_ids[row]], store.entities[store.entity_codes[row]],
+             [store.names[i] for i in store.other.get(row, ())])
+            for row, cik in enumerate(store.ciks)
+        )
+
+        return self.upsert(rows)
+
+    def resolve_pending(self, processes=None):
+        """
+
+         Step 3 of the sketch: regex classification of FilerAwaitingClassification
+         (one classify_many batch). Still unsure CIKs stay pending -- they need a
+         /submissions/ lookup as last resort.
+
+         Returns the number of CIKs moved out.
+
+        """
+
+        pending = self.conn.execute("SELECT cik, name FROM FilerAwaitingClassification").fetchall()
+        ents = self.classifier.classify_many(((name, None) for _, name in pending), processes=processes)
+
+        resolved = [(cik, name, ent, None) for (cik, name), ent in zip(pending, ents) if ent]
+        self.upsert(resolved)
+
+        return len(resolved)
+
+    # ------------------------------------------------------------- ParserIDX sink
+
+    def add_filing(self, cik, form_type, filed, accs):
+        # filings are not kept here -- see columnar.IdxColumnarSink
+        pass
+
+    def add_entities(self, store):
+        """ classified CIKs of a parse() run (whole store or one spilled chunk) """
+
+        counts = self.upsert_store(store)
+        print(f"=========== SQLite: {counts['new']} new, {counts['existing']} existing, {counts['pending']} pending ===")
+
+    def close(self, parser=None):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # ------------------------------------------------------------- reads
+
+    def counts(self):
+        return {
+            table: self.conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+            for table in ("Company", "Person", "FilerAwaitingClassification", "OtherName")
+        }
+
+    def flags(self, cik):
+        row = self.conn.execute("SELECT flags FROM Company WHERE cik = ?", (int(cik),)).fetchone()
+        return tuple(row[0].split(",")) if row and row[0] else ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,453 @@
+"""
+
+ Compact, array-backed replacement for ParserIDX.small_db
+
+ small_db used to be {cik: {"original_name", "other_names", "entity", "forms": [{...}]}}
+ -- one dict per CIK plus one dict per form. At full-history scale that is
+ gigabytes of object overhead. EntityStore keeps the same information in columns:
+
+    rows      cik (int) -> row
+    names     interned once, rows point at name ids
+    forms     earliest filing per (cik, form type) as packed ints, linked in date order:
+              type code, YYYYMMDD, accession number (filer * 10^8 + yy * 10^6 + seq)
+    bitsets   one int per row, bit n set == form type code n already seen
+
+ Reading it like the old dict still works (store[cik]["forms"] ...), but the
+ returned dicts are built on the fly - write through the methods.
+
+"""
+
+from array import array
+from collections.abc import Mapping
+
+
+def pack_accession(accs: str) -> int:
+    """ "0001437749-24-034426" -> 1437749_24_034426 (fits an int64), -1 if not an accession number """
+
+    parts = accs.split("-")
+
+    if len(parts) != 3 or not all(p.isdigit() for p in parts) or len(parts[1]) != 2:
+        return -1
+
+    return int(parts[0]) * 100_000_000 + int(parts[1]) * 1_000_000 + int(parts[2])
+
+
+def unpack_accession(packed: int) -> str:
+    filer, rest = divmod(packed, 100_000_000)
+    yy, seq = divmod(rest, 1_000_000)
+    return f"{filer:010d}-{yy:02d}-{seq:06d}"
+
+
+class EntityStore(Mapping):
+    """ see module doc -- dict-like read view keyed by the CIK string as in the idx files """
+
+    # return values of add()
+    UNCHANGED = 0
+    NEW_CIK = 1
+    NEW_FORM = 2
+    EARLIER = 3     # a kept form type got an earlier filing (full-index files are sorted by company, not date)
+
+    def __init__(self):
+
+        self._rows = {}                 # cik -> row
+
+        # --- per row
+        self.ciks = array("q")
+        self.name_ids = array("l")      # original name
+        self.entity_codes = array("l")  # index into self.entities
+        self.seen = []                  # form type bitsets (python ints)
+        self.first = array("l")         # first filing of the row, -1 == none
+        self.last = array("l")
+        self.other = {}                 # row -> array("l") of other name ids (sparse)
+
+        # --- per kept filing (linked per row through f_next)
+        self.f_type = array("H")
+        self.f_date = array("l")
+        self.f_acc = array("q")
+        self.f_next = array("l")
+
+        # --- interned values
+        self.names = []
+        self._name_ids = {}
+        self._name_bytes = 0            # running size estimate of self.names, see nbytes()
+        self.form_types = []
+        self._form_codes = {}
+        self.entities = [None]
+        self._entity_codes = {None: 0}
+        self.raw_accs = {}              # filing -> accession string that did not pack
+
+        self.records = 0                # idx records seen (kept or not)
+
+    # ------------------------------------------------------------- interning
+
+    def _intern_name(self, name):
+        nid = self._name_ids.get(name)
+
+        if nid is None:
+            nid = self._name_ids[name] = len(self.names)
+            self.names.append(name)
+            self._name_bytes += len(name) + 49
+
+        return nid
+
+    def form_code(self, form_type):
+        code = self._form_codes.get(form_type)
+
+        if code is None:
+            code = self._form_codes[form_type] = len(self.form_types)
+            self.form_types.append(form_type)
+
+        return code
+
+    def _entity_code(self, ent):
+        if isinstance(ent, list):
+            ent = tuple(ent)
+
+        code = self._entity_codes.get(ent)
+
+        if code is None:
+            code = self._entity_codes[ent] = len(self.entities)
+            self.entities.append(ent)
+
+        return code
+
+    # ------------------------------------------------------------- writes
+
+    def add(self, cik, name, form_type, filed, accs):
+        """
+
+         one idx record in -- returns UNCHANGED | NEW_CIK | NEW_FORM | EARLIER
+         (anything but UNCHANGED == the classification input of that CIK changed)
+
+         cik: int or digit string, filed: YYYYMMDD int or string (dashes ok)
+
+        """
+
+        cik = int(cik)
+        code = self.form_code(form_type)
+        row = self._rows.get(cik)
+        self.records += 1
+
+        if row is None:
+            row = self._rows[cik] = len(self.ciks)
+            self.ciks.append(cik)
+            self.name_ids.append(self._intern_name(name))
+            self.entity_codes.append(0)
+            self.seen.append(1 << code)
+            self.first.append(-1)
+            self.last.append(-1)
+            self._add_filing(row, code, filed, accs)
+            return self.NEW_CIK
+
+        nid = self._intern_name(name)
+
+        if nid != self.name_ids[row]:
+            # -- tracking name changes per CIK --- e.g. Zuckerberg Max --- Zuckerberg Marx
+            others = self.other.get(row)
+
+            if others is None:
+                self.other[row] = array("l", [nid])
+            elif nid not in others:
+                others.append(nid)
+
+        bit = 1 << code
+
+        if self.seen[row] & bit:
+            return self._keep_earliest(row, code, filed, accs)
+
+        # new form type == regime info
+        self.seen[row] |= bit
+        self._add_filing(row, code, filed, accs)
+        return self.NEW_FORM
+
+    def _add_filing(self, row, code, filed, accs):
+        idx = len(self.f_type)
+
+        if isinstance(filed, str):
+            filed = int(filed.replace("-", ""))
+
+        packed = pack_accession(accs)
+        if packed < 0:
+            self.raw_accs[idx] = accs
+
+        self.f_type.append(code)
+        self.f_date.append(filed)
+        self.f_acc.append(packed)
+        self.f_next.append(-1)
+
+        self._link(row, idx)
+
+    def _link(self, row, idx):
+        """ inserts filing idx into the row's list -- after every filing of the same or an earlier date """
+
+        last = self.last[row]
+
+        # daily files come in date order -- the append is the common case
+        if last < 0 or self.f_date[last] <= self.f_date[idx]:
+            if last < 0:
+                self.first[row] = idx
+            else:
+                self.f_next[last] = idx
+
+            self.last[row] = idx
+            return
+
+        prev, cur = -1, self.first[row]
+
+        while self.f_date[cur] <= self.f_date[idx]:
+            prev, cur = cur, self.f_next[cur]
+
+        self.f_next[idx] = cur
+
+        if prev < 0:
+            self.first[row] = idx
+        else:
+            self.f_next[prev] = idx
+
+    def _unlink(self, row, idx):
+        prev, cur = -1, self.first[row]
+
+        while cur != idx:
+            prev, cur = cur, self.f_next[cur]
+
+        if prev < 0:
+            self.first[row] = self.f_next[idx]
+        else:
+            self.f_next[prev] = self.f_next[idx]
+
+        if self.last[row] == idx:
+            self.last[row] = prev
+
+        self.f_next[idx] = -1
+
+    def _keep_earliest(self, row, code, filed, accs):
+        """ form type already kept -- an earlier filing of it replaces the kept one (EARLIER), else UNCHANGED """
+
+        if isinstance(filed, str):
+            filed = int(filed.replace("-", ""))
+
+        # not before the latest kept filing -- always the case for files read in date order
+        if filed >= self.f_date[self.last[row]]:
+            return self.UNCHANGED
+
+        for idx in self._filings(row):
+            if self.f_type[idx] == code:
+                break
+
+        if filed >= self.f_date[idx]:
+            return self.UNCHANGED
+
+        packed = pack_accession(accs)
+        self.raw_accs.pop(idx, None)
+        if packed < 0:
+            self.raw_accs[idx] = accs
+
+        self._unlink(row, idx)
+        self.f_date[idx] = filed
+        self.f_acc[idx] = packed
+        self._link(row, idx)
+
+        return self.EARLIER
+
+    def merge(self, other):
+        """
+
+         Folds another (partial) store into this one, as if other's records had
+         been add()-ed after ours:
+
+            - first seen original name wins, the earliest filing per form type
+            - other names are unioned in first-seen order
+            - record counters add up
+
+         so merging shards of consecutive idx files left to right gives exactly the
+         store of one sequential run -- and merge(a, merge(b, c)) == merge(merge(a, b), c).
+         Entities are not merged, classify the result once.
+
+         Returns [(cik, NEW_CIK | NEW_FORM | EARLIER)] for the CIKs whose classification input changed.
+
+        """
+
+        changed = []
+
+        for orow, cik in enumerate(other.ciks):
+            names = [other.names[other.name_ids[orow]]]
+            names += [other.names[i] for i in other.other.get(orow, ())]
+
+            row = self._rows.get(cik)
+            status = self.UNCHANGED
+
+            if row is None:
+                row = self._rows[cik] = len(self.ciks)
+                self.ciks.append(cik)
+                self.name_ids.append(self._intern_name(names[0]))
+                self.entity_codes.append(0)
+                self.seen.append(0)
+                self.first.append(-1)
+                self.last.append(-1)
+                names = names[1:]
+                status = self.NEW_CIK
+
+            for name in names:
+                nid = self._intern_name(name)
+
+                if nid == self.name_ids[row]:
+                    continue
+
+                others = self.other.get(row)
+
+                if others is None:
+                    self.other[row] = array("l", [nid])
+                elif nid not in others:
+                    others.append(nid)
+
+            for i in other._filings(orow):
+                code = self.form_code(other.form_types[other.f_type[i]])
+                bit = 1 << code
+
+                accs = other.raw_accs.get(i) or unpack_accession(other.f_acc[i])
+
+                if self.seen[row] & bit:
+                    if self._keep_earliest(row, code, other.f_date[i], accs) == self.EARLIER:
+                        status = status or self.EARLIER
+                    continue
+
+                self.seen[row] |= bit
+                self._add_filing(row, code, other.f_date[i], accs)
+                status = status or self.NEW_FORM
+
+            if status:
+                changed.append((cik, status))
+
+        self.records += other.records
+
+        return changed
+
+    def add_record(self, cik, names, filings):
+        """
+
+         one already combined CIK in (e.g. out of a spill run) -- names[0] is the original,
+         filings are (form type, filed, accession) with one per form type
+
+        """
+
+        cik = int(cik)
+
+        if cik in self._rows:
+            raise Exception(f"CIK {cik} is already in the store")
+
+        row = self._rows[cik] = len(self.ciks)
+        self.ciks.append(cik)
+        self.name_ids.append(self._intern_name(names[0]))
+        self.entity_codes.append(0)
+        self.seen.append(0)
+        self.first.append(-1)
+        self.last.append(-1)
+
+        if len(names) > 1:
+            self.other[row] = array("l", [self._intern_name(n) for n in names[1:]])
+
+        for form_type, filed, accs in filings:
+            code = self.form_code(form_type)
+            self.seen[row] |= 1 << code
+            self._add_filing(row, code, filed, accs)
+
+        return row
+
+    def set_entity(self, cik, ent):
+        self.entity_codes[self._rows[int(cik)]] = self._entity_code(ent)
+
+    # ------------------------------------------------------------- reads
+
+    def row(self, cik):
+        return self._rows[int(cik)]
+
+    def original_name(self, cik):
+        return self.names[self.name_ids[self.row(cik)]]
+
+    def other_names(self, cik):
+        return [self.names[i] for i in self.other.get(self.row(cik), ())]
+
+    def entity(self, cik):
+        return self.entities[self.entity_codes[self.row(cik)]]
+
+    def has_form(self, cik, form_type):
+        """ O(1) -- bitset lookup """
+
+        code = self._form_codes.get(form_type)
+        return code is not None and bool(self.seen[self.row(cik)] >> code & 1)
+
+    def _filings(self, row):
+        idx = self.first[row]
+
+        while idx >= 0:
+            yield idx
+            idx = self.f_next[idx]
+
+    def forms_of(self, cik):
+        """ form types of a CIK in the order they were first filed (what ENTS.classify wants) """
+
+        return [self.form_types[self.f_type[i]] for i in self._filings(self.row(cik))]
+
+    def filings(self, cik):
+        """ [(form type, YYYYMMDD int, accession string)] of a CIK """
+
+        out = []
+
+        for i in self._filings(self.row(cik)):
+            accs = self.raw_accs.get(i) or unpack_accession(self.f_acc[i])
+            out.append((self.form_types[self.f_type[i]], self.f_date[i], accs))
+
+        return out
+
+    def iter_ciks(self):
+        """ int CIKs in first-seen order """
+
+        return iter(self.ciks)
+
+    def nbytes(self):
+        """ rough size of the columns and the interned names -- O(1), called after every idx file """
+
+        arrays = (self.ciks, self.name_ids, self.entity_codes, self.first, self.last,
+                  self.f_type, self.f_date, self.f_acc, self.f_next)
+
+        return (
+            sum(a.itemsize * len(a) for a in arrays)
+            + 100 * len(self._rows)        # dict slot + int key
+            + 36 * len(self.seen)
+            + self._name_bytes
+        )
+
+    # ------------------------------------------------------------- dict-like view
+
+    def __getitem__(self, cik):
+        try:
+            row = self._rows[int(cik)]
+        except (ValueError, TypeError):
+            raise KeyError(cik)
+
+        return {
+            "original_name": self.names[self.name_ids[row]],
+            "other_names": [self.names[i] for i in self.other.get(row, ())],
+            "entity": self.entities[self.entity_codes[row]],
+            "forms": [
+                {"accs": accs, "filed": f"{filed:08d}", "type": ft}
+                for ft, filed, accs in self.filings(cik)
+            ],
+        }
+
+    def __contains__(self, cik):
+        try:
+            return int(cik) in self._rows
+        except (ValueError, TypeError):
+            return False
+
+    def __iter__(self):
+        return (str(c) for c in self.ciks)
+
+    def __len__(self):
+        return len(self.ciks)
+
+    def to_dict(self):
+        """ the old dict-of-dicts small_db """
+
+        return {k: self[k] for k in self}
@@ -0,0 +1,301 @@
+"""
+
+ Binary, memory-mappable form of the CIK_SUBSIDIARIES snapshots (EFTsQuery.small_db).
+
+    from_json("CIK_SUBSIDIARIES_2024_JAN_01__2025_OCT_06.json")    # -> ....bin next to it
+    with ExhibitSnapshot("CIK_SUBSIDIARIES_2024_JAN_01__2025_OCT_06.bin") as snap:
+        snap.exhibits(1995807)      # ["0001193125-24-286982:d898161dex211.htm", ...]
+        snap.groups(1995807)        # [(1995807,), (1995807, 1234567)] -- single + joint filings
+        snap.to_json("out/")        # the same json again
+
+ Opening maps the file and reads the header only; every lookup is a binary search over
+ the mapped index -- nothing is parsed upfront.
+
+ Layout (little-endian, every section 4 byte aligned):
+
+    header          magic, version, counts, size of the meta json
+    meta            {"start", "end", "comment"} of the json snapshot
+    group_offsets   u32[groups + 1]     members of group g: members[group_offsets[g]:group_offsets[g + 1]]
+    members         u32[...]            CIKs, sorted within a group
+    positions       u8[...]             place of each member in the original key ("cik1_cik2" order)
+    exhibit_offsets u32[groups + 1]     exhibits of group g, in collection order
+    filers          u32[exhibits]       accession "0001193125-24-286982" as (1193125, 24, 286982)
+    years           u8[exhibits]
+    sequences       u32[exhibits]
+    name_offsets    u32[exhibits + 1]   file name of exhibit i: names[name_offsets[i]:name_offsets[i + 1]]
+    index_ciks      u32[index]          (cik, group) pairs sorted -- every member of every group
+    index_groups    u32[index]
+    names           utf-8 blob
+
+ An accession that does not pack is stored whole in names, its filer set to 0xFFFFFFFF.
+
+"""
+
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+# dummy / fake import
+from .edgar_cache import atomic_write
+from .parser_EFT import load_snapshot, save_snapshot
+
+
+MAGIC = b"PLMYEX21"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIII")      # magic, version, groups, members, exhibits, index, meta size
+RAW = 0xFFFFFFFF
+
+
+def _require_little_endian():
+    if sys.byteorder != "little":
+        raise Exception("exhibit snapshots are little-endian, memoryview casts need a little-endian host")
+
+
+def _pad(n):
+    return -n % 4
+
+
+def _pack(accs):
+    """ "0001193125-24-286982" -> (1193125, 24, 286982), None if it does not pack """
+
+    parts = accs.split("-")
+
+    if len(parts) != 3 or not all(p.isdigit() for p in parts) or len(parts[1]) != 2 or int(parts[0]) >= RAW:
+        return None
+
+    return int(parts[0]), int(parts[1]), int(parts[2])
+
+
+def write_exhibit_snapshot(small_db, path, start=None, end=None, comment=None):
+    """ EFTsQuery.small_db ({cik | (cik, ...): [_id, ...]}) -> binary snapshot at path """
+
+    _require_little_endian()
+
+    group_offsets, members, positions = array("I", [0]), array("I"), array("B")
+    exhibit_offsets, filers, years, sequences = array("I", [0]), array("I"), array("B"), array("I")
+    name_offsets, names = array("I", [0]), bytearray()
+    index = []
+
+    for g, (key, ids) in enumerate(small_db.items()):
+        ciks = [int(c) for c in (key if isinstance(key, tuple) else (key,))]
+        order = sorted(range(len(ciks)), key=ciks.__getitem__)
+
+        for pos in order:
+            members.append(ciks[pos])
+            positions.append(pos)
+            index.append((ciks[pos], g))
+
+        group_offsets.append(len(members))
+
+        for doc_id in ids:
+            accs, _, file_name = doc_id.partition(":")
+            packed = _pack(accs)
+
+            if packed is None:
+                packed, file_name = (RAW, 0, 0), doc_id
+
+            filers.append(packed[0])
+            years.append(packed[1])
+            sequences.append(packed[2])
+            names += file_name.encode("utf-8")
+            name_offsets.append(len(names))
+
+        exhibit_offsets.append(len(filers))
+
+    index.sort()
+    index_ciks = array("I", (c for c, _ in index))
+    index_groups = array("I", (g for _, g in index))
+
+    meta = json.dumps({
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "comment": comment,
+    }).encode("utf-8")
+
+    out = bytearray(HEADER.pack(MAGIC, VERSION, len(group_offsets) - 1, len(members), len(filers), len(index), len(meta)))
+
+    for section in (meta, group_offsets, members, positions, exhibit_offsets, filers, years, sequences,
+                    name_offsets, index_ciks, index_groups, names):
+        data = section.tobytes() if isinstance(section, array) else bytes(section)
+        out += data + b"\0" * _pad(len(data))
+
+    atomic_write(os.path.abspath(path), bytes(out))
+    return path
+
+
+class ExhibitSnapshot:
+    """ see module doc -- read-only, mmap backed """
+
+    def __init__(self, path):
+        _require_little_endian()
+
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = None
+
+        # everything is checked before the first view exists, so close() never meets an
+        # exported buffer -- a truncated file or broken meta is "not a snapshot", not an
+        # IndexError / JSONDecodeError later on
+        try:
+            counts, names_size = self._check(os.fstat(self._file.fileno()).st_size)
+        except Exception:
+            self.close()
+            raise Exception(f"not an exhibit snapshot (v{VERSION}): {path}") from None
+
+        n_groups, n_members, n_exhibits, n_index, meta_size = counts
+        view = memoryview(self._map)
+        offset = HEADER.size + meta_size + _pad(meta_size)
+
+        def section(n, fmt=None):
+            nonlocal offset
+            size = n * (1 if fmt in (None, "B") else 4)
+            out = view[offset:offset + size]
+            offset += size + _pad(size)
+            return out.cast(fmt) if fmt else out
+
+        self.group_offsets = section(n_groups + 1, "I")
+        self.members = section(n_members, "I")
+        self.positions = section(n_members, "B")
+        self.exhibit_offsets = section(n_groups + 1, "I")
+        self.filers = section(n_exhibits, "I")
+        self.years = section(n_exhibits, "B")
+        self.sequences = section(n_exhibits, "I")
+        self.name_offsets = section(n_exhibits + 1, "I")
+        self.index_ciks = section(n_index, "I")
+        self.index_groups = section(n_index, "I")
+        self.names = section(names_size)
+
+    def _check(self, file_size):
+        """ maps the file, validates header, sizes and meta -> (header counts, size of names) """
+
+        # an empty file does not map, a short one has no header -- neither is a snapshot
+        if file_size < HEADER.size:
+            raise ValueError("no header")
+
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_groups, n_members, n_exhibits, n_index, meta_size = HEADER.unpack_from(self._map)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("magic / version")
+
+        # every section but names, in file order -- name_offsets is the last one before index_ciks
+        sizes = (meta_size, 4 * (n_groups + 1), 4 * n_members, n_members, 4 * (n_groups + 1),
+                 4 * n_exhibits, n_exhibits, 4 * n_exhibits, 4 * (n_exhibits + 1), 4 * n_index, 4 * n_index)
+        ends = [HEADER.size]
+
+        for size in sizes:
+            ends.append(ends[-1] + size + _pad(size))
+
+        if file_size < ends[-1]:
+            raise ValueError("truncated")
+
+        names_size, = struct.unpack_from("<I", self._map, ends[9] - 4)
+
+        if file_size < ends[-1] + names_size + _pad(names_size):
+            raise ValueError("truncated names")
+
+        meta = json.loads(self._map[HEADER.size:HEADER.size + meta_size])
+
+        self.start = datetime.date.fromisoformat(meta["start"]) if meta["start"] else None
+        self.end = datetime.date.fromisoformat(meta["end"]) if meta["end"] else None
+        self.comment = meta["comment"]
+
+        return (n_groups, n_members, n_exhibits, n_index, meta_size), names_size
+
+    # ------------------------------------------------------------- lookups
+
+    def _groups_of(self, cik):
+        cik = int(cik)
+        lo = bisect_left(self.index_ciks, cik)
+        hi = bisect_right(self.index_ciks, cik, lo)
+        return [self.index_groups[i] for i in range(lo, hi)]
+
+    def group(self, g):
+        """ CIKs of group g in their original order """
+
+        lo, hi = self.group_offsets[g], self.group_offsets[g + 1]
+        ciks = [0] * (hi - lo)
+
+        for i in range(lo, hi):
+            ciks[self.positions[i]] = self.members[i]
+
+        return tuple(ciks)
+
+    def _exhibit(self, i):
+        name = bytes(self.names[self.name_offsets[i]:self.name_offsets[i + 1]]).decode("utf-8")
+
+        if self.filers[i] == RAW:
+            return name
+
+        return f"{self.filers[i]:010d}-{self.years[i]:02d}-{self.sequences[i]:06d}:{name}"
+
+    def _exhibits_of(self, g):
+        return [self._exhibit(i) for i in range(self.exhibit_offsets[g], self.exhibit_offsets[g + 1])]
+
+    def groups(self, cik):
+        """ every group (single filer or joint) cik is part of """
+
+        return [self.group(g) for g in self._groups_of(cik)]
+
+    def exhibits(self, cik):
+        """ _ids of every exhibit cik filed, alone or jointly """
+
+        return [doc_id for g in self._groups_of(cik) for doc_id in self._exhibits_of(g)]
+
+    def items(self):
+        """ (key, [_id, ...]) like EFTsQuery.small_db -- 10 digit CIK strings, tuples for joint groups """
+
+        for g in range(len(self)):
+            ciks = tuple(f"{c:010d}" for c in self.group(g))
+            yield ciks if len(ciks) > 1 else ciks[0], self._exhibits_of(g)
+
+    def __len__(self):
+        return len(self.group_offsets) - 1
+
+    # ------------------------------------------------------------- json
+
+    def to_small_db(self):
+        return dict(self.items())
+
+    def to_json(self, folder, start=None, end=None):
+        """ back to CIK_SUBSIDIARIES_<start>__<end>.json in folder, returns the path """
+
+        start, end = start or self.start, end or self.end
+
+        if not (start and end):
+            raise Exception("snapshot has no start / end - pass them")
+
+        return save_snapshot(self.to_small_db(), folder, start, end, self.comment)
+
+    def close(self):
+        # views first - an mmap with exported buffers refuses to close
+        for name, value in list(vars(self).items()):
+            if isinstance(value, memoryview):
+                value.release()
+                setattr(self, name, None)
+
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def from_json(json_path, path=None):
+    """ CIK_SUBSIDIARIES_*.json -> binary snapshot (default: same name, .bin), returns its path """
+
+    small_db, comment, start, end = load_snapshot(json_path)
+    path = path or os.path.splitext(json_path)[0] + ".bin"
+
+    return write_exhibit_snapshot(small_db, path, start, end, comment)
@@ -0,0 +1,359 @@
+"""
+
+ EX-21 documents: EFTsQuery _ids -> archive urls -> (cached) bodies -> subsidiary rows
+
+    downloader = ExhibitDownloader(workers=8)
+    for row in downloader.subsidiaries(EFTsQuery(2024, 2025).subsidiaries()):
+        row.cik, row.name, row.jurisdiction, row.ownership     # SubsidiaryRow
+
+    columnar.write_subsidiaries(downloader.subsidiaries(db), "out/subsidiaries.parquet")
+
+ Downloads run `workers` wide under the shared client's budget (or rate=), bodies are
+ kept compressed in an IndexCache below cache_dir/exhibits. Only a sliding window of
+ workers * 2 bodies is held at a time and every body is parsed in chunks, so the
+ stage runs over any number of exhibits in constant memory.
+
+ extract_subsidiaries() reads html tables, html paragraphs / <pre> blocks and plain
+ text lists; a row is (name, jurisdiction or None, ownership % or None).
+
+"""
+
+import codecs
+import io
+import os
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+# dummy / fake import
+from .edgar_cache import DEFAULT_CACHE_DIR, IndexCache
+from .instrumentation import RunStats
+from .utilities import Request, TokenBucket, ordered_map, timed_fetch
+
+
+SubsidiaryRow = namedtuple("SubsidiaryRow", "cik accession file_name name jurisdiction ownership")
+
+
+def archive_path(cik, doc_id):
+    """ 1995807, "0001193125-24-286982:d898161dex211.htm" -> "data/1995807/000119312524286982/d898161dex211.htm" """
+
+    accs, _, file_name = doc_id.partition(":")
+    return f"data/{int(cik)}/{accs.replace('-', '')}/{file_name}"
+
+
+# ---------- extraction
+
+_PCT = re.compile(r"\(?\s*(\d{1,3}(?:\.\d+)?)\s*%\s*\)?")
+_NUMBER = re.compile(r"\d{1,3}(?:\.\d+)?")
+_CELLS = re.compile(r"\t+|\s{2,}|\s*\.{3,}\s*")
+_TRAILING_PAREN = re.compile(r"^(.+?)\s*\(([^()]+)\)$")
+_ORGANIZED_AS = re.compile(
+    r"^(.+?),?\s+an?\s+(.+?)\s+(corporation|company|limited liability company|limited partnership|"
+    r"partnership|entity|trust|limited company|societe anonyme|public limited company)$",
+    re.IGNORECASE,
+)
+_BOILERPLATE = re.compile(
+    r"^(exhibit\b|subsidiaries of\b|list of\b|(significant )?subsidiaries\b|the following\b|page \d|\*)",
+    re.IGNORECASE,
+)
+_HEADER = re.compile(
+    r"^(names?\b|subsidiar|jurisdiction|state\b|country|place\b|percent|%|ownership|owned|organi[sz]ed|"
+    r"incorporat|legal name|domicile|formation)",
+    re.IGNORECASE,
+)
+_NOT_A_JURISDICTION = re.compile(r"\d|formerly|f/k/a|d/b/a|doing business", re.IGNORECASE)
+
+_BLOCK = {"p", "div", "br", "li", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def _clean(text):
+    return " ".join(text.replace("\xa0", " ").split())
+
+
+def _row(cells):
+    """ cells of one table row / text line -> (name, jurisdiction, ownership) or None """
+
+    cells = [_clean(c) for c in cells]
+    cells = [c for c in cells if c]
+    ownership = None
+    rest = []
+
+    for c in cells:
+        m = _PCT.fullmatch(c)
+
+        if m:
+            ownership = float(m.group(1))
+        elif c == "%":
+            continue
+        elif _NUMBER.fullmatch(c):
+            # "100" | "%" split over two cells, or a bare "Percent Owned" column
+            if float(c) <= 100:
+                ownership = float(c)
+        else:
+            rest.append(c)
+
+    if not rest:
+        return None
+
+    if _BOILERPLATE.match(rest[0]) or rest[0].endswith(":") or len(rest[0]) > 150:
+        return None
+
+    if ownership is None and all(_HEADER.match(c) for c in rest):
+        return None
+
+    name = rest[0]
+    jurisdiction = rest[-1] if len(rest) > 1 else None
+
+    if ownership is None:
+        m = _PCT.search(name)
+        if m:
+            ownership = float(m.group(1))
+            name = _clean(name[:m.start()] + name[m.end():])
+
+    if jurisdiction is None:
+        m = _TRAILING_PAREN.match(name) or _ORGANIZED_AS.match(name)
+
+        if m and not _NOT_A_JURISDICTION.search(m.group(2)):
+            name, jurisdiction = m.group(1).rstrip(" ,"), m.group(2)
+
+    if sum(ch.isalpha() for ch in name) < 2:
+        return None
+
+    return name, jurisdiction, ownership
+
+
+def _split_line(line):
+    """ plain text list line -> cells ("NAME ..... Delaware", "NAME<tab>Delaware", "NAME (Delaware)") """
+
+    return _CELLS.split(line.strip())
+
+
+class _RowParser(HTMLParser):
+    """ incremental html -> rows: table rows as cells, paragraphs / <pre> lines as text lines """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+
+        self.rows = []          # drained by the caller after every feed()
+        self._cells = None      # open <tr>
+        self._cell = None       # open <td> / <th>
+        self._line = []
+        self._pre = False
+
+    def _flush_line(self):
+        line = "".join(self._line)
+        self._line = []
+
+        if line.strip():
+            self.rows.append(_split_line(line))
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._flush_line()
+            self._cells = []
+        elif tag in ("td", "th"):
+            self._cell = []
+        elif tag == "pre":
+            self._flush_line()
+            self._pre = True
+        elif tag in _BLOCK:
+            if self._cell is not None:
+                self._cell.append(" ")
+            else:
+                self._flush_line()
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th"):
+            if self._cell is not None and self._cells is not None:
+                self._cells.append("".join(self._cell))
+            self._cell = None
+        elif tag == "tr":
+            if self._cells:
+                self.rows.append(self._cells)
+            self._cells = None
+        elif tag == "pre":
+            self._flush_line()
+            self._pre = False
+        elif tag in _BLOCK and self._cell is None:
+            self._flush_line()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+            return
+
+        if not self._pre:
+            self._line.append(data)
+            return
+
+        # <pre>: every newline ends a row
+        *done, rest = data.split("\n")
+
+        for part in done:
+            self._line.append(part)
+            self._flush_line()
+
+        self._line.append(rest)
+
+    def close(self):
+        super().close()
+        self._flush_line()
+
+
+def extract_subsidiaries(source, chunk=64 * 1024):
+    """
+
+     Streams (name, jurisdiction, ownership) out of an EX-21 document.
+
+     source: binary file object, bytes or str. Read `chunk` bytes at a time -- html
+     goes through an incremental parser, anything without markup is read line by line.
+
+    """
+
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    text = decoder.decode(source.read(chunk))
+    html = re.search(r"<(html|body|table|tr|p|div|pre|br|font)\b", text, re.IGNORECASE) is not None
+
+    parser = _RowParser() if html else None
+    pending = ""
+
+    while True:
+        if html:
+            parser.feed(text)
+            cells_of = parser.rows
+            parser.rows = []
+        else:
+            *lines, pending = (pending + text).split("\n")
+            cells_of = [_split_line(line) for line in lines]
+
+        for cells in cells_of:
+            row = _row(cells)
+            if row:
+                yield row
+
+        if not text:
+            break
+
+        data = source.read(chunk)
+        text = decoder.decode(data, final=not data)
+
+    if html:
+        parser.close()
+        rest = parser.rows
+    else:
+        rest = [_split_line(pending)]
+
+    for cells in rest:
+        row = _row(cells)
+        if row:
+            yield row
+
+
+# ---------- downloads
+
+class ExhibitDownloader:
+    """ see module doc """
+
+    BASE = "https://www.sec.gov/Archives/edgar/"
+
+    # swap for your own wrapper (or the offline stand-in, see sec_stand_in.py)
+    request_cls = Request
+
+    def __init__(self, cache_dir=None, workers=8, rate=None, cache_max_bytes=4 * 1024 ** 3,
+                 cache_only=False, stats=None):
+        """
+
+         cache_dir: root of the caches (default ~/.cache/palmy/edgar), exhibits go below /exhibits
+         workers: concurrent downloads
+         rate: requests / second of this downloader, shared by all workers;
+               None == only the process-wide budget of the shared HTTP client (utilities.get_client)
+         cache_only: never touch the network - whatever is not cached is skipped
+         stats: RunStats to record into (default: a fresh one, see self.stats)
+
+        """
+
+        self.cache = IndexCache(os.path.join(cache_dir or DEFAULT_CACHE_DIR, "exhibits"), max_bytes=cache_max_bytes)
+        self.cache_only = cache_only
+        self.workers = workers
+        self.limiter = TokenBucket(rate=rate) if rate else None
+        self.stats = stats or RunStats()
+
+    def _get(self, url):
+        """ one rate-limited request, timed into self.stats """
+
+        return timed_fetch(self.request_cls, url, self.limiter, self.stats)
+
+    def open(self, cik, doc_id):
+        """ binary file object of one exhibit (cache first), None if missing / failed / not cached in cache_only mode """
+
+        url = self.BASE + archive_path(cik, doc_id)
+        cached = self.cache.open(url)
+
+        if cached is not None:
+            self.stats.count("cache_hits")
+            return cached
+
+        self.stats.count("cache_misses")
+
+        if self.cache_only:
+            return None
+
+        response = self._get(url)
+
+        if response.status_code == 404:
+            print(f"Warning: exhibit not found - {url}")
+            self.stats.count("exhibits_missing")
+            return None
+
+        # one bad document must not end the stream (ordered_map re-raises) -- only global
+        # conditions raise, like a missing User-Agent in the client
+        if response.status_code >= 400:
+            print(f"Warning: exhibit failed (HTTP {response.status_code}) - {url}")
+            self.stats.count("exhibits_failed")
+            return None
+
+        self.cache.put(url, response.content)
+        return io.BytesIO(response.content)
+
+    @staticmethod
+    def _jobs(small_db):
+        """ (cik, _id) of an EFTsQuery store -- joint groups are fetched under their first CIK """
+
+        for key, ids in small_db.items():
+            cik = key[0] if isinstance(key, tuple) else key
+
+            for doc_id in ids:
+                yield cik, doc_id
+
+    def documents(self, small_db):
+        """
+
+         Yields (cik, _id, file object or None) in small_db order, while up to
+         `workers` downloads run in the background (see utilities.ordered_map).
+
+        """
+
+        return ordered_map(lambda job: (*job, self.open(*job)), self._jobs(small_db), self.workers)
+
+    def subsidiaries(self, small_db):
+        """ SubsidiaryRow stream over every exhibit of an EFTsQuery store ({cik | (cik, ...): [_id, ...]}) """
+
+        for cik, doc_id, source in self.documents(small_db):
+            if source is None:
+                continue
+
+            accs, _, file_name = doc_id.partition(":")
+
+            # one document's rows at a time - the stage times the parsing, not the consumer
+            with self.stats.stage("extract"), source:
+                rows = [SubsidiaryRow(int(cik), accs, file_name, *row) for row in extract_subsidiaries(source)]
+
+            self.stats.count("exhibits")
+            self.stats.count("subsidiaries", len(rows))
+
+            yield from rows
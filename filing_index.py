@@ -0,0 +1,243 @@
+"""
+
+ Read-only query indexes over the filings of a ParserIDX run, built once after parse():
+
+    index = parser.filing_index()                       # every filing of the parsed idx files
+    index.ciks_with_form("N-MFP2", *quarter_days(2024, 3))
+    index.filings_of(1067983, "2024-01-01", "2024-12-31")
+    index.filings_between(20240701, 20240705, form_types=("8-K", "6-K"))
+
+ Built from a record stream (from_idx_records, e.g. ParserIDX.iter_records) the index
+ holds every filing. Built from a store (from_store) it holds what the store keeps: the
+ earliest filing per CIK and form type, i.e. when a CIK entered a regime -- a query then
+ reads "first N-MFP2 of the window was filed in Q3", not "filed an N-MFP2 in Q3".
+
+ Layout -- one row per filing, all columns sorted by filing date (then CIK, form type):
+
+    dates / ciks / types / accs    parallel arrays (bisect on dates == date range)
+    by_form                        form type code -> array of rows (ascending, so date order too)
+    cik_keys / cik_offsets / by_cik
+                                   CSR: rows of cik_keys[k] are by_cik[cik_offsets[k]:cik_offsets[k + 1]],
+                                   in date order
+
+ Dates are YYYYMMDD ints; every query also takes "YYYY-MM-DD", "YYYYMMDD" or a date.
+ Bounds are inclusive, None == open.
+
+"""
+
+import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+# dummy / fake import
+from .entity_store import pack_accession, unpack_accession
+from .spill import SpilledEntities
+
+
+Filing = namedtuple("Filing", "cik form_type filed accession")
+
+
+def _day(value):
+    """ "2024-07-01" | "20240701" | 20240701 | date -> 20240701, None stays None """
+
+    if value is None or isinstance(value, int):
+        return value
+
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.year * 10_000 + value.month * 100 + value.day
+
+    return int(str(value).replace("-", ""))
+
+
+def quarter_days(year, quarter):
+    """ (first day, last day) of a calendar quarter as YYYYMMDD """
+
+    if quarter not in (1, 2, 3, 4):
+        raise Exception(f"quarter must be 1-4, got: {quarter}")
+
+    last = (None, 331, 630, 930, 1231)[quarter]
+    return year * 10_000 + (quarter - 1) * 300 + 101, year * 10_000 + last
+
+
+class FilingIndex:
+    """ see module doc """
+
+    def __init__(self, ciks, types, dates, accs, raw_accs, form_types):
+        """
+
+         Columns in any order (see from_store / from_records), sorted here.
+
+         raw_accs: {position: accession string} for accessions that did not pack (accs == -1)
+
+        """
+
+        # ties broken by CIK + form type: the same filings come out in the same order,
+        # whichever store (or spilled run) they were read from
+        order = sorted(range(len(dates)), key=lambda i: (dates[i], ciks[i], form_types[types[i]]))
+
+        self.form_types = list(form_types)
+        self._form_codes = {ft: code for code, ft in enumerate(self.form_types)}
+
+        self.dates = array("l", (dates[i] for i in order))
+        self.ciks = array("q", (ciks[i] for i in order))
+        self.types = array("H", (types[i] for i in order))
+        self.accs = array("q", (accs[i] for i in order))
+
+        moved = {old: new for new, old in enumerate(order)} if raw_accs else {}
+        self.raw_accs = {moved[i]: a for i, a in raw_accs.items()}
+
+        # --- form type -> rows
+        by_form = [[] for _ in self.form_types]
+
+        for row, code in enumerate(self.types):
+            by_form[code].append(row)
+
+        self.by_form = [array("l", rows) for rows in by_form]
+
+        # --- cik -> rows (CSR); the sort is stable, so each CIK's rows stay in date order
+        self.by_cik = array("l", sorted(range(len(self.ciks)), key=self.ciks.__getitem__))
+        self.cik_keys = array("q")
+        self.cik_offsets = array("l")
+
+        for pos, row in enumerate(self.by_cik):
+            cik = self.ciks[row]
+
+            if not self.cik_keys or self.cik_keys[-1] != cik:
+                self.cik_keys.append(cik)
+                self.cik_offsets.append(pos)
+
+        self.cik_offsets.append(len(self.by_cik))
+
+    # ------------------------------------------------------------- build
+
+    @classmethod
+    def from_idx_records(cls, records):
+        """ one pass over IdxRecords (ParserIDX.iter_records, iter_idx_records) -- every filing """
+
+        return cls.from_records((r.cik, ((r.form_type, r.date_filed, r.accs),)) for r in records)
+
+    @classmethod
+    def from_store(cls, store):
+        """ EntityStore (ParserIDX.small_db) or spill.SpilledEntities -- earliest filing per CIK and form type only """
+
+        if isinstance(store, SpilledEntities):
+            return cls.from_records((cik, filings) for cik, _, _, filings in store.records())
+
+        # the store links filings per row -- one walk gives every filing its CIK
+        owners = array("q", bytes(8 * len(store.f_type)))
+
+        for row, cik in enumerate(store.ciks):
+            for i in store._filings(row):
+                owners[i] = cik
+
+        return cls(owners, store.f_type, store.f_date, store.f_acc, store.raw_accs, store.form_types)
+
+    @classmethod
+    def from_records(cls, records):
+        """ one pass over (cik, [(form type, filed, accession), ...]) """
+
+        ciks, types, dates, accs = array("q"), array("H"), array("l"), array("q")
+        raw_accs, form_types, codes = {}, [], {}
+
+        for cik, filings in records:
+            for form_type, filed, accession in filings:
+                code = codes.get(form_type)
+
+                if code is None:
+                    code = codes[form_type] = len(form_types)
+                    form_types.append(form_type)
+
+                packed = pack_accession(accession)
+
+                if packed < 0:
+                    raw_accs[len(accs)] = accession
+
+                ciks.append(int(cik))
+                types.append(code)
+                dates.append(_day(filed))
+                accs.append(packed)
+
+        return cls(ciks, types, dates, accs, raw_accs, form_types)
+
+    # ------------------------------------------------------------- helpers
+
+    def _range(self, start, end):
+        """ rows [lo, hi) filed within start..end """
+
+        start, end = _day(start), _day(end)
+        lo = 0 if start is None else bisect_left(self.dates, start)
+        hi = len(self.dates) if end is None else bisect_right(self.dates, end)
+        return lo, hi
+
+    def _filing(self, row):
+        accs = self.raw_accs.get(row) or unpack_accession(self.accs[row])
+        return Filing(self.ciks[row], self.form_types[self.types[row]], self.dates[row], accs)
+
+    # ------------------------------------------------------------- queries
+
+    def ciks_with_form(self, form_type, start=None, end=None):
+        """ sorted CIKs with a form_type filing within start..end """
+
+        code = self._form_codes.get(form_type)
+        if code is None:
+            return []
+
+        lo, hi = self._range(start, end)
+        rows = self.by_form[code]
+        ciks = self.ciks
+
+        return sorted({ciks[r] for r in rows[bisect_left(rows, lo):bisect_left(rows, hi)]})
+
+    def filings_between(self, start=None, end=None, form_types=None):
+        """ [Filing] within start..end in date order, optionally of form_types only """
+
+        lo, hi = self._range(start, end)
+
+        if form_types is None:
+            return [self._filing(r) for r in range(lo, hi)]
+
+        rows = []
+
+        for form_type in form_types:
+            code = self._form_codes.get(form_type)
+
+            if code is not None:
+                posting = self.by_form[code]
+                rows.extend(posting[bisect_left(posting, lo):bisect_left(posting, hi)])
+
+        return [self._filing(r) for r in sorted(rows)]
+
+    def filings_of(self, cik, start=None, end=None):
+        """ [Filing] of one CIK within start..end, in date order """
+
+        cik = int(cik)
+        k = bisect_left(self.cik_keys, cik)
+
+        if k == len(self.cik_keys) or self.cik_keys[k] != cik:
+            return []
+
+        rows = self.by_cik[self.cik_offsets[k]:self.cik_offsets[k + 1]]
+
+        if start is not None or end is not None:
+            lo, hi = self._range(start, end)
+            rows = rows[bisect_left(rows, lo):bisect_left(rows, hi)]
+
+        return [self._filing(r) for r in rows]
+
+    def form_counts(self, start=None, end=None):
+        """ {form type: filings within start..end} """
+
+        lo, hi = self._range(start, end)
+        counts = {}
+
+        for code, posting in enumerate(self.by_form):
+            n = bisect_left(posting, hi) - bisect_left(posting, lo)
+
+            if n:
+                counts[self.form_types[code]] = n
+
+        return counts
+
+    def __len__(self):
+        return len(self.dates)
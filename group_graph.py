@@ -0,0 +1,270 @@
+"""
+
+ Corporate group graph over the EFT results: who files exhibits with whom and who lists whom
+ as a subsidiary -- the joint filer tuples of EFTsQuery.small_db turned into edges.
+
+    graph = CorporateGraph.build(
+        exhibits=query.small_db,                            # or an ExhibitSnapshot
+        subsidiaries=ExhibitDownloader().subsidiaries(query.small_db),
+        names=NameIndex.from_store(parser.small_db),        # resolves subsidiary names to CIKs
+    )
+    graph.family(1995807)            # every CIK connected by joint filings / subsidiary lists
+    graph.ultimate_parent(2044431)   # top of the parent chain
+
+ Edges:
+
+    CIK -> exhibit       every _id a CIK filed (alone or jointly)
+    CIK <-> co-filer     members of one joint filing, pairwise
+    parent -> subsidiary EX-21 rows whose name resolves to exactly one CIK
+
+ Storage is CSR per edge kind: nodes are positions in the sorted `ciks` array, the
+ neighbours of node v are targets[offsets[v]:offsets[v + 1]]. Families are the connected
+ components (union-find over co-filer + subsidiary edges), stored CSR as well; ultimate
+ parents are resolved once at build time. Lookups are a bisect and a slice.
+
+"""
+
+from array import array
+from bisect import bisect_left
+
+
+def _csr(n, src, dst):
+    """ edges (src[i] -> dst[i]) -> (offsets, targets), targets of a node ascending """
+
+    offsets = array("l", [0]) * (n + 1)
+
+    for s in src:
+        offsets[s + 1] += 1
+
+    for v in range(n):
+        offsets[v + 1] += offsets[v]
+
+    targets = array("l", [0]) * len(src)
+    fill = array("l", offsets)
+
+    # counting sort by source over the edges ordered by target -- stable, so targets come out ascending
+    for i in sorted(range(len(src)), key=dst.__getitem__):
+        s = src[i]
+        targets[fill[s]] = dst[i]
+        fill[s] += 1
+
+    return offsets, targets
+
+
+class CorporateGraph:
+    """ see module doc -- immutable, use build() """
+
+    def __init__(self, ciks, exhibits, exhibit_edges, cofiler_edges, parent_edges):
+        """
+
+         ciks: sorted array("q") of every CIK (node v == ciks[v])
+         exhibits: [_id] (exhibit e == exhibits[e])
+         *_edges: (src array, dst array) of node ids -- exhibit_edges point at exhibit ids,
+                  cofiler_edges hold both directions, parent_edges point parent -> subsidiary
+
+        """
+
+        n = len(ciks)
+
+        self.ciks = ciks
+        self.exhibit_ids = exhibits
+
+        self.exhibit_offsets, self.exhibit_targets = _csr(n, *exhibit_edges)
+        self.cofiler_offsets, self.cofilers_of = _csr(n, *cofiler_edges)
+        self.child_offsets, self.children = _csr(n, *parent_edges)
+        self.parent_offsets, self.parents_of = _csr(n, parent_edges[1], parent_edges[0])
+
+        self._families(n, cofiler_edges, parent_edges)
+        self._ultimate_parents(n)
+
+    # ------------------------------------------------------------- build
+
+    @classmethod
+    def build(cls, exhibits=(), subsidiaries=(), names=None, min_ownership=None):
+        """
+
+         exhibits: EFTsQuery store ({cik | (cik, ...): [_id, ...]}), ExhibitSnapshot or (key, ids) pairs
+         subsidiaries: exhibits.SubsidiaryRow stream (ExhibitDownloader.subsidiaries)
+         names: name_index.NameIndex -- needed for subsidiary edges
+         min_ownership: drop rows listing a smaller stake (rows without a percentage stay)
+
+        """
+
+        if hasattr(exhibits, "items"):
+            exhibits = exhibits.items()
+
+        ciks = set()
+        doc_ids = []
+        exhibit_pairs = []          # (cik, exhibit id)
+        cofiler_pairs = set()       # (cik, cik) lower first
+        parent_pairs = set()
+
+        for key, ids in exhibits:
+            members = sorted({int(c) for c in (key if isinstance(key, tuple) else (key,))})
+            ciks.update(members)
+
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    cofiler_pairs.add((members[a], members[b]))
+
+            for doc_id in ids:
+                e = len(doc_ids)
+                doc_ids.append(doc_id)
+                exhibit_pairs.extend((c, e) for c in members)
+
+        if subsidiaries and names is None:
+            raise Exception("subsidiary edges need a NameIndex (names=) to resolve the names")
+
+        for row in subsidiaries:
+            if min_ownership is not None and row.ownership is not None and row.ownership < min_ownership:
+                continue
+
+            resolved = set(names.lookup(row.name))
+
+            # ambiguous names (several CIKs) are no evidence
+            if len(resolved) == 1:
+                child = resolved.pop()
+
+                if child != row.cik:
+                    parent_pairs.add((row.cik, child))
+                    ciks.update((row.cik, child))
+
+        ciks = array("q", sorted(ciks))
+        node = {cik: v for v, cik in enumerate(ciks)}
+
+        exhibit_edges = (array("l", (node[c] for c, _ in exhibit_pairs)), array("l", (e for _, e in exhibit_pairs)))
+
+        cofiler_src, cofiler_dst = array("l"), array("l")
+        for a, b in cofiler_pairs:
+            cofiler_src.extend((node[a], node[b]))
+            cofiler_dst.extend((node[b], node[a]))
+
+        parent_edges = (array("l", (node[p] for p, _ in parent_pairs)), array("l", (node[c] for _, c in parent_pairs)))
+
+        return cls(ciks, doc_ids, exhibit_edges, (cofiler_src, cofiler_dst), parent_edges)
+
+    def _families(self, n, cofiler_edges, parent_edges):
+        """ union-find (by size, path halving) -> family of every node + CSR of the members """
+
+        root = array("l", range(n))
+        size = array("l", [1]) * n
+
+        def find(v):
+            while root[v] != v:
+                root[v] = root[root[v]]
+                v = root[v]
+            return v
+
+        for src, dst in (cofiler_edges, parent_edges):
+            for a, b in zip(src, dst):
+                a, b = find(a), find(b)
+
+                if a != b:
+                    if size[a] < size[b]:
+                        a, b = b, a
+                    root[b] = a
+                    size[a] += size[b]
+
+        labels = {}
+        self.family_of = array("l", [0]) * n
+
+        for v in range(n):
+            self.family_of[v] = labels.setdefault(find(v), len(labels))
+
+        self.family_offsets, self.family_members = _csr(len(labels), self.family_of, array("l", range(n)))
+
+    def _ultimate_parents(self, n):
+        """
+
+         Top of each node's parent chain. Several parents (joint ventures, double listings):
+         the lowest CIK is followed. A cycle ends at the node where it closes.
+
+        """
+
+        self.ultimate = array("l", [-1]) * n
+
+        for v in range(n):
+            if self.ultimate[v] >= 0:
+                continue
+
+            path, seen, u = [], set(), v
+
+            while self.ultimate[u] < 0 and u not in seen:
+                seen.add(u)
+                path.append(u)
+
+                lo = self.parent_offsets[u]
+                if lo == self.parent_offsets[u + 1]:
+                    break
+
+                u = self.parents_of[lo]
+
+            top = self.ultimate[u] if self.ultimate[u] >= 0 else u
+
+            for w in path:
+                self.ultimate[w] = top
+
+    # ------------------------------------------------------------- queries
+
+    def node(self, cik):
+        """ node id of a CIK, KeyError if it is not in the graph """
+
+        cik = int(cik)
+        v = bisect_left(self.ciks, cik)
+
+        if v == len(self.ciks) or self.ciks[v] != cik:
+            raise KeyError(cik)
+
+        return v
+
+    def _ciks(self, nodes):
+        return [self.ciks[v] for v in nodes]
+
+    def family(self, cik):
+        """ CIKs connected to cik by joint filings / subsidiary lists (itself included), ascending """
+
+        f = self.family_of[self.node(cik)]
+        return self._ciks(self.family_members[self.family_offsets[f]:self.family_offsets[f + 1]])
+
+    def family_id(self, cik):
+        return self.family_of[self.node(cik)]
+
+    def ultimate_parent(self, cik):
+        return self.ciks[self.ultimate[self.node(cik)]]
+
+    def parents(self, cik):
+        v = self.node(cik)
+        return self._ciks(self.parents_of[self.parent_offsets[v]:self.parent_offsets[v + 1]])
+
+    def subsidiaries(self, cik):
+        v = self.node(cik)
+        return self._ciks(self.children[self.child_offsets[v]:self.child_offsets[v + 1]])
+
+    def cofilers(self, cik):
+        v = self.node(cik)
+        return self._ciks(self.cofilers_of[self.cofiler_offsets[v]:self.cofiler_offsets[v + 1]])
+
+    def exhibits(self, cik):
+        """ _ids cik filed, alone or jointly """
+
+        v = self.node(cik)
+        return [self.exhibit_ids[e] for e in self.exhibit_targets[self.exhibit_offsets[v]:self.exhibit_offsets[v + 1]]]
+
+    def families(self, min_size=2):
+        """ (family id, [CIKs]) of every family with at least min_size members """
+
+        for f in range(len(self.family_offsets) - 1):
+            lo, hi = self.family_offsets[f], self.family_offsets[f + 1]
+
+            if hi - lo >= min_size:
+                yield f, self._ciks(self.family_members[lo:hi])
+
+    def __contains__(self, cik):
+        try:
+            self.node(cik)
+        except (KeyError, ValueError, TypeError):
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.ciks)
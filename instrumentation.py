@@ -0,0 +1,254 @@
+"""
+
+ Per-stage counters / timings for the parsers -- is a slow run network-, parse- or classify-bound?
+
+    stats = RunStats(profile={"classify": "cprofile", "parse": "tracemalloc"}, profile_dir="profiles")
+    parser = ParserIDX(2024, 2025, stats=stats)
+    parser.parse()
+    stats.print_summary()
+
+ Stages used by the parsers:
+
+    fetch      one HTTP request (worker threads included)
+    parse      one idx body streamed into small_db (decompression included)
+    classify   one classification batch
+    query      one EFTS window (EFTsQuery)
+
+ Profiling is opt-in per stage: "cprofile" collects every run of the stage into one
+ profile (current thread only), "tracemalloc" keeps the peak traced memory of the stage
+ plus the top allocations at that peak. Both are written by dump_profiles().
+
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+class RunStats:
+    """ see module doc -- thread-safe, picklable (worker processes send theirs back, see merge()) """
+
+    # upper bounds (ms) of the fetch latency buckets, the last one is open
+    LATENCY_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    PROFILERS = ("cprofile", "tracemalloc")
+
+    def __init__(self, profile=None, profile_dir=None):
+        """
+        Args:
+            profile: {stage: "cprofile" | "tracemalloc"} - stages to profile, default none
+            profile_dir: where dump_profiles() writes to (default: cwd)
+        """
+
+        for stage, kind in (profile or {}).items():
+            if kind not in self.PROFILERS:
+                raise Exception(f"profiler for {stage} must be one of {self.PROFILERS}, got: {kind}")
+
+        self.counters = {}                  # name -> int
+        self.stages = {}                    # stage -> [runs, seconds]
+        self.peaks = {}                     # name -> max seen
+        self.latency = [0] * (len(self.LATENCY_BUCKETS) + 1)
+
+        self.profile = dict(profile or {})
+        self.profile_dir = profile_dir
+        self._profiles = {}                 # stage -> cProfile.Profile
+        self._mem_peaks = {}                # stage -> (peak bytes, tracemalloc snapshot)
+        self._tracing = False               # tracemalloc was started by us
+
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # profilers / snapshots stay with the process that ran them
+        state.update(_lock=None, _profiles={}, _mem_peaks={}, _tracing=False)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------- recording
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def peak(self, name, value):
+        with self._lock:
+            if value > self.peaks.get(name, 0):
+                self.peaks[name] = value
+
+    def fetched(self, nbytes, seconds):
+        """ one finished request """
+
+        bucket = bisect_left(self.LATENCY_BUCKETS, seconds * 1000)
+
+        with self._lock:
+            self.latency[bucket] += 1
+            self.counters["requests"] = self.counters.get("requests", 0) + 1
+            self.counters["bytes_fetched"] = self.counters.get("bytes_fetched", 0) + (nbytes or 0)
+
+    @contextmanager
+    def stage(self, name):
+        """ times the block as one run of `name` (profiles it if asked to) """
+
+        kind = self.profile.get(name)
+        profiler = None
+
+        if kind == "cprofile":
+            with self._lock:
+                profiler = self._profiles.setdefault(name, cProfile.Profile())
+            try:
+                profiler.enable()
+            except ValueError:
+                # another profiler is already active in this thread (nested stage) -- just time it
+                profiler = None
+
+        elif kind == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+                self._tracing = True
+            tracemalloc.reset_peak()
+
+        started = time.perf_counter()
+
+        try:
+            yield
+
+        finally:
+            elapsed = time.perf_counter() - started
+
+            if profiler is not None:
+                profiler.disable()
+
+            elif kind == "tracemalloc":
+                peak = tracemalloc.get_traced_memory()[1]
+
+                if peak > self._mem_peaks.get(name, (0, None))[0]:
+                    self._mem_peaks[name] = (peak, tracemalloc.take_snapshot())
+
+            with self._lock:
+                runs = self.stages.setdefault(name, [0, 0.0])
+                runs[0] += 1
+                runs[1] += elapsed
+
+    def merge(self, other):
+        """ adds another RunStats (e.g. of a worker process) to this one """
+
+        with self._lock:
+            for name, n in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+            for name, (runs, seconds) in other.stages.items():
+                mine = self.stages.setdefault(name, [0, 0.0])
+                mine[0] += runs
+                mine[1] += seconds
+
+            for name, value in other.peaks.items():
+                self.peaks[name] = max(self.peaks.get(name, 0), value)
+
+            self.latency = [a + b for a, b in zip(self.latency, other.latency)]
+
+    # ------------------------------------------------------------- reading
+
+    def seconds(self, stage):
+        return self.stages.get(stage, (0, 0.0))[1]
+
+    def rate(self, counter, stage):
+        """ counter / second spent in stage, None if the stage never ran """
+
+        seconds = self.seconds(stage)
+        return self.counters.get(counter, 0) / seconds if seconds else None
+
+    def cache_hit_rate(self):
+        hits = self.counters.get("cache_hits", 0)
+        total = hits + self.counters.get("cache_misses", 0)
+        return hits / total if total else None
+
+    def latency_histogram(self):
+        """ {"<=10ms": n, ..., ">10000ms": n} """
+
+        labels = [f"<={b}ms" for b in self.LATENCY_BUCKETS] + [f">{self.LATENCY_BUCKETS[-1]}ms"]
+        return dict(zip(labels, self.latency))
+
+    def summary(self):
+        return {
+            "counters": dict(self.counters),
+            "peaks": dict(self.peaks),
+            "stages": {k: {"runs": r, "seconds": s} for k, (r, s) in self.stages.items()},
+            "fetch_latency": self.latency_histogram(),
+            "lines_per_second": self.rate("lines", "parse"),
+            "classify_per_second": self.rate("classify_calls", "classify"),
+            "cache_hit_rate": self.cache_hit_rate(),
+        }
+
+    def print_summary(self):
+        s = self.summary()
+
+        print("=" * 70)
+        print("RUN STATS")
+        print("=" * 70)
+
+        for stage, v in s["stages"].items():
+            print(f"{stage:12} {v['runs']:>8} runs {v['seconds']:>10.2f}s")
+
+        for name, n in sorted(s["counters"].items()):
+            print(f"{name:24} {n:>14,}")
+
+        for name, n in sorted(s["peaks"].items()):
+            print(f"peak {name:19} {n:>14,}")
+
+        for label, key in (("lines / s", "lines_per_second"), ("classify / s", "classify_per_second")):
+            if s[key] is not None:
+                print(f"{label:24} {s[key]:>14,.0f}")
+
+        if s["cache_hit_rate"] is not None:
+            print(f"{'cache hit rate':24} {s['cache_hit_rate']:>14.1%}")
+
+        if self.counters.get("requests"):
+            print("fetch latency:")
+            for label, n in s["fetch_latency"].items():
+                if n:
+                    print(f"  {label:>10} {n:>8}")
+
+    def dump_profiles(self, folder=None):
+        """ writes <stage>.prof (+ .txt) / <stage>.tracemalloc.txt, returns the paths """
+
+        folder = folder or self.profile_dir or os.getcwd()
+        os.makedirs(folder, exist_ok=True)
+        paths = []
+
+        for stage, profiler in self._profiles.items():
+            path = os.path.join(folder, f"{stage}.prof")
+            profiler.dump_stats(path)
+
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+
+            with open(path + ".txt", "w") as f:
+                f.write(out.getvalue())
+
+            paths.append(path)
+
+        for stage, (peak, snapshot) in self._mem_peaks.items():
+            path = os.path.join(folder, f"{stage}.tracemalloc.txt")
+
+            with open(path, "w") as f:
+                f.write(f"peak traced memory: {peak:,} bytes\n\n")
+                for line in snapshot.statistics("lineno")[:40]:
+                    f.write(f"{line}\n")
+
+            paths.append(path)
+
+        if self._tracing:
+            # tracing slows everything down (and is inherited by forked workers) -- off once dumped
+            tracemalloc.stop()
+            self._tracing = False
+
+        return paths
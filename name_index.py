@@ -0,0 +1,261 @@
+"""
+
+ Name -> CIK lookup over every name a CIK filed under (original + other names).
+
+    index = NameIndex.from_store(parser.small_db)      # EntityStore or SpilledEntities
+    index.lookup("Morgan Stanley & Co. LLC")           # exact, on the normalized key
+    index.prefix("GOLDMAN SACHS")                      # sorted key range
+    index.search("Goldmen Sachs Grp")                  # approximate, trigram Dice score
+    index.save("names.idx") / NameIndex.load("names.idx")
+
+ Layout -- one entry per distinct (key, cik):
+
+    keys       normalized names, sorted (exact + prefix are bisects)
+    ciks       array("q") parallel to keys
+    names      the name as filed, parallel to keys
+    heads      array("l") -- first entry of each distinct key (a key filed by 7 CIKs is one head)
+    reversed   heads sorted by the reversed key (suffix neighbours)
+    postings   trigram -> array("l") of heads, shortest key first (approximate search)
+
+"""
+
+import pickle
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+# dummy / fake import
+from .edgar_cache import atomic_write
+from .spill import SpilledEntities
+
+
+_STATE_SUFFIX = re.compile(r"\s*/[A-Z]{2,4}/?\s*$")     # "/DE/", "/ADV", "/CA"
+_NOT_WORD = re.compile(r"[^A-Z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(name: str) -> str:
+    """
+
+     "Nestlé Holdings, Inc.  /DE/" -> "NESTLE HOLDINGS INC"
+
+     upper case, accents folded, & -> AND, state / ADV suffixes and punctuation dropped
+
+    """
+
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").upper()
+
+    while True:
+        stripped = _STATE_SUFFIX.sub("", name)
+        if stripped == name:
+            break
+        name = stripped
+
+    name = name.replace("&", " AND ").replace(".", "").replace("'", "")
+    name = _NOT_WORD.sub(" ", name)
+
+    return _SPACES.sub(" ", name).strip()
+
+
+_SLICES = [slice(i, i + 3) for i in range(512)]
+
+
+def trigrams(key: str):
+    padded = f"  {key} "
+
+    if len(padded) > len(_SLICES):
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    return set(map(padded.__getitem__, _SLICES[:len(padded) - 2]))
+
+
+class NameIndex:
+    """ see module doc """
+
+    RAREST = 6          # query trigrams counted at most per search, rarest first
+    BUDGET = 2_000      # postings counted at most per search
+    CANDIDATES = 12     # best counted heads verified per search
+    NEIGHBOURS = 6      # heads verified on each side of the query in keys / reversed
+
+    def __init__(self):
+        self.keys = []
+        self.ciks = array("q")
+        self.names = []
+        self.heads = array("l")
+        self.reversed = array("l")
+        self.postings = {}
+
+    # ------------------------------------------------------------- build
+
+    @classmethod
+    def from_records(cls, records):
+        """ one pass over (cik, [names]) """
+
+        entries = {}
+
+        for cik, names in records:
+            cik = int(cik)
+
+            for name in names:
+                key = normalize(name)
+                if key and (key, cik) not in entries:
+                    entries[(key, cik)] = name
+
+        index = cls()
+        postings = {}
+
+        for i, ((key, cik), name) in enumerate(sorted(entries.items())):
+            index.keys.append(key)
+            index.ciks.append(cik)
+            index.names.append(name)
+
+            if i and index.keys[i - 1] == key:
+                continue
+
+            index.heads.append(i)
+
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(i)
+
+        # shortest key first: on equal counts the shorter key has the better Dice score,
+        # and most_common() keeps the counting order for ties
+        index.postings = {gram: array("l", sorted(ids, key=lambda i: len(index.keys[i]))) for gram, ids in postings.items()}
+        index.reversed = array("l", sorted(index.heads, key=lambda i: index.keys[i][::-1]))
+        return index
+
+    @classmethod
+    def from_store(cls, store):
+        """ EntityStore (ParserIDX.small_db) or spill.SpilledEntities """
+
+        if isinstance(store, SpilledEntities):
+            return cls.from_records((cik, names) for cik, names, _, _ in store.records())
+
+        return cls.from_records(
+            (cik, [store.names[store.name_ids[row]]] + [store.names[i] for i in store.other.get(row, ())])
+            for row, cik in enumerate(store.ciks)
+        )
+
+    # ------------------------------------------------------------- queries
+
+    def lookup(self, name):
+        """ CIKs whose normalized name equals the query's """
+
+        key = normalize(name)
+        i = bisect_left(self.keys, key)
+        out = []
+
+        while i < len(self.keys) and self.keys[i] == key:
+            out.append(self.ciks[i])
+            i += 1
+
+        return out
+
+    def prefix(self, text, limit=20):
+        """ [(name, cik)] whose normalized name starts with the query's, in key order """
+
+        key = normalize(text)
+        i = bisect_left(self.keys, key)
+        out = []
+
+        while i < len(self.keys) and len(out) < limit and self.keys[i].startswith(key):
+            out.append((self.names[i], self.ciks[i]))
+            i += 1
+
+        return out
+
+    def search(self, text, limit=10, min_score=0.5):
+        """
+
+         [(score, name, cik)] best first -- Dice coefficient over character trigrams
+
+         Two cheap candidate sources, both verified with the exact score:
+
+         - the RAREST query trigrams, rarest first, while they fit in BUDGET postings --
+           the top CANDIDATES by shared count. A trigram list bigger than the rest of
+           the budget stops the count (one list alone ranks nothing).
+         - the NEIGHBOURS heads around the query in keys and in reversed: a typo keeps
+           either the prefix or the suffix before / after it, one of them is at least
+           half the name.
+
+         Work per query is bounded, whatever the size of the index (< 1 ms at 1M
+         entries, see check_name_search in benchmarks.py).
+
+        """
+
+        key = normalize(text)
+        if not key:
+            return []
+
+        keys = self.keys
+        grams = trigrams(key)
+        known = sorted((len(self.postings[g]), g) for g in grams if g in self.postings)
+
+        counts = Counter()
+        budget = self.BUDGET
+
+        for size, gram in known[:self.RAREST]:
+            if size > budget:
+                break
+
+            counts.update(self.postings[gram])
+            budget -= size
+
+        heads = {i for i, _ in counts.most_common(self.CANDIDATES)}
+        w = self.NEIGHBOURS
+
+        i = bisect_left(self.heads, key, key=keys.__getitem__)
+        heads.update(self.heads[max(0, i - w):i + w])
+
+        i = bisect_left(self.reversed, key[::-1], key=lambda j: keys[j][::-1])
+        heads.update(self.reversed[max(0, i - w):i + w])
+
+        best = []
+
+        for i in heads:
+            other = trigrams(keys[i])
+            score = 2 * len(grams & other) / (len(grams) + len(other))
+
+            if score >= min_score:
+                best.append((score, i))
+
+        best.sort(key=lambda x: -x[0])
+        scored = []
+
+        for score, i in best:
+            if len(scored) >= limit and score < scored[-1][0]:
+                break
+
+            # every CIK filed under the key
+            j = i
+            while j < len(keys) and keys[j] == keys[i]:
+                scored.append((score, self.names[j], self.ciks[j]))
+                j += 1
+
+        scored.sort(key=lambda x: (-x[0], x[1]))
+        return scored[:limit]
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ------------------------------------------------------------- disk
+
+    def save(self, path):
+        state = {"keys": self.keys, "ciks": self.ciks, "names": self.names, "heads": self.heads,
+                 "reversed": self.reversed, "postings": self.postings}
+        atomic_write(path, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+
+        index = cls()
+        index.keys = state["keys"]
+        index.ciks = state["ciks"]
+        index.names = state["names"]
+        index.heads = state["heads"]
+        index.reversed = state["reversed"]
+        index.postings = state["postings"]
+        return index
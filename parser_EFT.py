@@ -1,3 +1,14 @@
+import datetime
+import json
+import os
+import re
+
+# dummy / fake import
+from .edgar_cache import atomic_write
+from .instrumentation import RunStats
+from .utilities import Request, TokenBucket, ordered_map, timed_fetch
+
+
 class EFTsQuery:
     """
 
@@ -9,9 +20,30 @@ class EFTsQuery:
     """
 
     BASE = "https://efts.sec.gov/LATEST/search-index?"
-    EX21_1 = BASE + "fileType=EX-21.1"
 
-    def __init__(self, start=2003, end=None):
+    PAGE = 100          # hits per search-index page
+    MAX_HITS = 10_000   # search-index does not page beyond this many hits of one query
+
+    # anything with .fetch(as_json=True) -- e.g. sec_stand_in.StandInRequest for offline runs
+    request_cls = Request
+
+    def __init__(self, start=2003, end=None, sinks=None, stats=None, workers=1, rate=None,
+                 file_types=("EX-21.1",)):
+        """
+
+         sinks: objects with add_exhibit(key, _id, file_type) - called for every collected hit -
+                and close(query) - called once crawl() is through all windows,
+                e.g. columnar.ExhibitColumnarSink
+         stats: RunStats to record into (default: a fresh one, see self.stats)
+         workers: concurrent requests -- window probes of plan() and the pages of all windows
+         rate: requests / second of this query, shared by all workers;
+               None == only the process-wide budget of the shared HTTP client (utilities.get_client)
+         file_types: exhibit types crawled together - one query, one window plan, one set of
+                     pages - each routed into its own store of self.results, e.g.
+                     ("EX-21.1", "EX-21", "EX-10.1", "EX-99.1"). self.small_db is the first one's.
+
+        """
+
         if start < 2003:
             raise Exception("Likely to not operate in any results pre-2003 - use Paper parser instead")
 
@@ -19,15 +51,131 @@ class EFTsQuery:
             # include current year fully
             end = datetime.datetime.now().year
 
-        # go until one year *after* the end, to capture full final year
         self.start_year = start
         self.end_year = end
-        self.small_db = {}
-        self.joints = {}
-        self.params = []
+        self.file_types = tuple(ft.strip().upper() for ft in file_types)
+        self.url = self.BASE + "fileType=" + ",".join(self.file_types)
+        self.results = {ft: {} for ft in self.file_types}     # file type -> {cik | (cik, ...): [_id, ...]}
+        self.small_db = self.results[self.file_types[0]]
+        self.joints = {}            # sorted CIKs -> the key of that joint group (first order seen)
+        self.ids = set()            # every collected _id -- pages / windows can overlap
+        self.sinks = list(sinks or ())
+        self.stats = stats or RunStats()
+        self.workers = workers
+        self.limiter = TokenBucket(rate=rate) if rate else None
+
+        # one window per calendar year, both ends inclusive -- plan() splits the busy ones
+        self.windows = [
+            (datetime.date(year, 1, 1), datetime.date(year, 12, 31))
+            for year in range(self.start_year, self.end_year + 1)
+        ]
+        self.params = [self._param(w) for w in self.windows]
+
+    @staticmethod
+    def _param(window):
+        start, end = window
+        return f"&startdt={start.isoformat()}&enddt={end.isoformat()}"
+
+    @staticmethod
+    def _window(param):
+        """ "&startdt=2024-01-01&enddt=2024-12-31" -> (date, date) """
+
+        m = re.search(r"startdt=(\d{4}-\d{2}-\d{2}).*enddt=(\d{4}-\d{2}-\d{2})", param)
+
+        if not m:
+            raise Exception(f"param needs startdt= and enddt=, got: {param}")
+
+        return datetime.date.fromisoformat(m.group(1)), datetime.date.fromisoformat(m.group(2))
+
+    def _get(self, url):
+        """ one rate-limited EFTS page (json), timed into self.stats """
+
+        return timed_fetch(self.request_cls, url, self.limiter, self.stats, as_json=True)
+
+    def _get_all(self, urls):
+        """ pages of `urls` in the same order, up to `workers` requests in the background (see ordered_map) """
+
+        return ordered_map(self._get, urls, self.workers)
+
+    # ------------------------------------------------------------- windows
+
+    def _capped(self, page):
+        total = page["hits"]["total"]
+        return total["value"] >= self.MAX_HITS or total.get("relation") == "gte"
+
+    @staticmethod
+    def _split(window):
+        """ halves a window: by calendar months while it spans several, then by days """
+
+        start, end = window
+        months = (end.year - start.year) * 12 + end.month - start.month
+
+        if months:
+            y, m = divmod(start.month - 1 + months // 2 + 1, 12)
+            right = datetime.date(start.year + y, m + 1, 1)
+        else:
+            right = start + datetime.timedelta(days=(end - start).days // 2 + 1)
 
-        for year in range(self.start_year + 1, self.end_year + 2):
-            self.params.append(f"&startdt={year - 1}-01-01&enddt={year}-01-01")
+        return (start, right - datetime.timedelta(days=1)), (right, end)
+
+    def plan(self, windows=None):
+        """
+
+         Adaptive windows: [(window, first page)] sorted by date, each under the
+         MAX_HITS cap of the search-index (beyond it EFTS does not page).
+
+         A window whose first page reports the cap is split in half -- year, months,
+         days -- and the halves are probed again, one level of the tree at a time
+         with all probes of a level in parallel. The probe is the leaf's first page,
+         so planning costs one extra request per split only.
+
+        """
+
+        frontier = list(windows or self.windows)
+        leaves = []
+
+        while frontier:
+            pages = self._get_all(f"{self.url}{self._param(w)}&from=0" for w in frontier)
+            split = []
+
+            for window, page in zip(frontier, pages):
+                if not self._capped(page):
+                    leaves.append((window, page))
+
+                elif window[0] == window[1]:
+                    print(f"Warning: more than {self.MAX_HITS} hits on {window[0]} alone - the rest is cut off by EFTS")
+                    leaves.append((window, page))
+
+                else:
+                    self.stats.count("window_splits")
+                    split.extend(self._split(window))
+
+            frontier = split
+
+        leaves.sort(key=lambda leaf: leaf[0])
+        self.stats.count("windows", len(leaves))
+
+        return leaves
+
+    def _crawl(self, leaves):
+        """ (window, page) of every leaf, leaf by leaf in offset order -- all pages fetched in parallel """
+
+        rest = [
+            (window, f"{self.url}{self._param(window)}&from={offset}")
+            for window, first in leaves
+            for offset in range(self.PAGE, min(first["hits"]["total"]["value"], self.MAX_HITS), self.PAGE)
+        ]
+        pages = self._get_all(url for _, url in rest)
+        pos = 0
+
+        for window, first in leaves:
+            yield window, first
+
+            while pos < len(rest) and rest[pos][0] == window:
+                yield window, next(pages)
+                pos += 1
+
+    # ------------------------------------------------------------- crawl
 
     def subsidiaries(self, param=None):
         """
@@ -36,86 +184,216 @@ class EFTsQuery:
              - Single filer sharing EX21.1 list (the 95% case)
              - Joint filer sharing EX21.1 list (the 5% case)
              - Multiple 21s per filer/joint using CIK as primary key
-            
+
+         param: one "&startdt=...&enddt=..." window instead of self.windows (still split if capped)
+
         """
 
+        self.crawl(param)
+        return self.small_db
+
+    def crawl(self, param=None):
+        """ every file type in one pass -> self.results ({file type: {cik | (cik, ...): [_id, ...]}}) """
+
+        windows = [self._window(param)] if param else self.windows
+
+        print(f"====== START from {windows[0][0]} to {windows[-1][1]} ======")
+
+        with self.stats.stage("plan"):
+            leaves = self.plan(windows)
+
+        print(f"Querying {len(leaves)} windows")
+
+        collected = {}
+
+        with self.stats.stage("query"):
+            for window, page in self._crawl(leaves):
+                hits = page.get("hits", {}).get("hits", [])
+                self.stats.count("hits", len(hits))
+
+                for _i in hits:
+                    collected[window] = collected.get(window, 0) + self._collect(_i)
+
+        for window, first in leaves:
+            print(f"  Retrieved {collected.get(window, 0)} / {first['hits']['total']['value']} results for {self._param(window)}")
+
         if not param:
-            print(f"====== START from {self.start_year} to {self.end_year} ======")
-            for param in self.params:
-                self.subsidiaries(param)
-            return self.small_db
+            for sink in self.sinks:
+                sink.close(self)
+
+        return self.results
+
+    def _collect(self, _i):
+        """ one hit into the store of its file type + sinks -- 1 if it was collected, 0 if skipped or already seen """
+
+        i = _i["_source"]
+
+        ciks = i["ciks"]
+
+        # Pick the first CIK as the key; this is typically the parent
+        if not ciks:
+            print("ERROR: Skipping filing with no CIKs:", i)
+            return 0
+
+        file_type = (i.get("file_type") or "").strip().upper()
+
+        # Skip any exhibit type not asked for — strictly match, the search is fuzzy (EX-21 for EX-21.1 etc.)
+        store = self.results.get(file_type)
 
-        print(f"Querying: {param}")
+        if store is None:
+            print(f"ERROR: Skipping exhibit type not asked for: {file_type}")
+            return 0
 
-        base_url = self.EX21_1 + param
-        from_offset = 0
-        total_hits = None
+        # the index can shift while we page
+        if _i["_id"] in self.ids:
+            self.stats.count("duplicate_hits")
+            return 0
 
-        while True:
-            url = f"{base_url}&from={from_offset}"
-            response = Request(url).fetch(as_json=True)
+        self.ids.add(_i["_id"])
 
-            hits = response.get("hits", {}).get("hits", [])
-            total_hits = response["hits"]["total"]["value"]
-            if not hits:
-                break
+        cik = ciks[0]
 
-            for _i in hits:
-                i = _i["_source"]
+        # A true EX-21.1 should normally have a single filer CIK (the parent)
+        # (contracts / press releases keep the joint tuple alike)
+        if len(ciks) != 1:
+            print(f"-- Multiple CIKs found - creating/inserting the tuple joint")
 
-                ciks = i["ciks"]
+            # Don't skip; sometimes joint 10-Ks include shared 21.1 exhibits.
+            # The information of seeing a joint group is already good for our DB
+            #       because joint group filing is evidence for a potentially meaningful relationship
 
-                # Pick the first CIK as the key; this is typically the parent
-                if not ciks:
-                    print("ERROR: Skipping filing with no CIKs:", i)
-                    continue
+            cik = self._joint(ciks)
+
+        if not store.get(cik):
+            store[cik] = []
+
+        store[cik].append(_i["_id"])
+        self.stats.count(f"exhibits {file_type}")
+
+        for sink in self.sinks:
+            sink.add_exhibit(cik, _i["_id"], file_type)
+
+        return 1
+
+    def _joint(self, ciks):
+        """ one key per joint group, whichever order its CIKs come back in """
+
+        return self.joints.setdefault(tuple(sorted(ciks)), tuple(ciks))
+
+    # ------------------------------------------------------------- snapshots
+
+    @classmethod
+    def sync(cls, snapshot, folder=None, today=None, **kwargs):
+        """
+
+         Incremental refresh of a CIK_SUBSIDIARIES_<start>__<end>.json snapshot:
+         queries EX-21.1 from its high-water date <end> (inclusive - that day may have
+         grown since) to today only, merges the new _ids per CIK / joint group and writes
+         CIK_SUBSIDIARIES_<start>__<today>.json next to it (or into folder). Joint groups
+         are matched on their CIKs, in whatever order a hit lists them. A snapshot that
+         already ends today is refused -- the new file would overwrite it.
+
+         kwargs: workers / rate / sinks / stats as for EFTsQuery()
+         Returns the query -- merged db in .small_db, the new file in .snapshot
+
+        """
 
-                file_type = (i.get("file_type") or "").strip().upper()
+        db, comment, start, end = load_snapshot(snapshot)
+        today = today or datetime.date.today()
 
-                # Skip any non-EX-21.1 exhibits — strictly match to avoid EX-99.x etc.
-                if file_type != "EX-21.1":
-                    print(f"ERROR: Skipping non-21.1 exhibit type: {file_type}")
-                    continue
+        # today == end would write the snapshot's own name over it
+        if end >= today:
+            raise Exception(f"nothing to sync: snapshot ends {end}, today is {today}")
 
-                cik = ciks[0]
+        query = cls(start=end.year, end=today.year, **kwargs)
+        query.windows = [(end, today)]
 
-                # A true EX-21.1 should normally have a single filer CIK (the parent)
-                if len(ciks) != 1:
-                    print(f"-- Multiple CIKs found - creating/inserting the tuple joint")
+        for key, ids in db.items():
+            key = query._joint(key) if isinstance(key, tuple) else key
+            query.small_db.setdefault(key, []).extend(ids)
+            query.ids.update(ids)
 
-                    # Don't skip; sometimes joint 10-Ks include shared 21.1 exhibits.
-                    # The information of seeing a joint group is already good for our DB
-                    #       because joint group filing is evidence for a potentially meaningful relationship
+        known = len(query.ids)
+        query.crawl()
+        print(f"====== {len(query.ids) - known} new exhibits since {end} ======")
 
-                    cik = tuple(ciks)
+        folder = folder or os.path.dirname(os.path.abspath(snapshot))
+        query.snapshot = save_snapshot(query.small_db, folder, start, today, comment)
 
-                if not self.small_db.get(cik):
-                    self.small_db[cik] = []
+        return query
 
-                self.small_db[cik].append(_i["_id"])
 
-            from_offset += 100
-            if from_offset >= total_hits:
-                break
+SNAPSHOT = re.compile(r"CIK_SUBSIDIARIES_(\d{4}_[A-Z]{3}_\d{2})__(\d{4}_[A-Z]{3}_\d{2})\.json$")
 
-        print(f"  Retrieved {from_offset} / {total_hits} results for {param}")
+
+def _snapshot_day(day):
+    """ date <-> "2025_OCT_06" """
+
+    if isinstance(day, str):
+        return datetime.datetime.strptime(day.title(), "%Y_%b_%d").date()
+
+    return f"{day.year}_{day.strftime('%b').upper()}_{day.day:02d}"
+
+
+def snapshot_name(start, end):
+    return f"CIK_SUBSIDIARIES_{_snapshot_day(start)}__{_snapshot_day(end)}.json"
+
+
+def load_snapshot(path):
+    """
+
+     CIK_SUBSIDIARIES_*.json -> (small_db, comment, start, end)
+
+     small_db as EFTsQuery keeps it ("cik1_cik2" keys back to tuples), start / end
+     from the file name. Tolerates whatever the dump left around the json object.
+
+    """
+
+    m = SNAPSHOT.search(os.path.basename(path))
+
+    if not m:
+        raise Exception(f"not a CIK_SUBSIDIARIES_<start>__<end>.json snapshot: {path}")
+
+    with open(path, encoding="utf-8") as f:
+        data, _ = json.JSONDecoder().raw_decode(f.read().strip())
+
+    comment = data.pop("comment", None)
+    db = {tuple(key.split("_")) if "_" in key else key: ids for key, ids in data.items()}
+
+    return db, comment, _snapshot_day(m.group(1)), _snapshot_day(m.group(2))
+
+
+def save_snapshot(small_db, folder, start, end, comment=None):
+    """ small_db -> folder/CIK_SUBSIDIARIES_<start>__<end>.json (joint keys "_" joined), returns the path """
+
+    data = {"comment": comment} if comment else {}
+
+    for key, ids in small_db.items():
+        data["_".join(key) if isinstance(key, tuple) else str(key)] = ids
+
+    path = os.path.join(folder, snapshot_name(start, end))
+    atomic_write(path, json.dumps(data, indent=2).encode("utf-8"))
+
+    return path
 
 
 # ------- TESTING
 
-EFTs = EFTsQuery(start=2024, end=2025) 
-original_dict = EFTs.subsidiaries()
+if __name__ == "__main__":
 
-import json
+    EFTs = EFTsQuery(start=2024, end=2025)
+    original_dict = EFTs.subsidiaries()
+
+    # --- temporary shit to work with .json schema (columnar.write_subsidiary_exhibits keeps the tuples)
 
-# --- temporary shit to work with .json schema
+    fixed = {}
+    for key, files in original_dict.items():
+        # key might be a tuple → make it a string
+        new_key = "_".join(key) if isinstance(key, tuple) else str(key)
+        fixed[new_key] = files
 
-fixed = {}
-for key, files in original_dict.items():
-    # key might be a tuple → make it a string
-    new_key = "_".join(key) if isinstance(key, tuple) else str(key)
-    fixed[new_key] = files
+    print(json.dumps(fixed, indent=2))
 
-print(json.dumps(fixed, indent=2))
+    # ---> Results in ".json"
 
-# ---> Results in ".json" 
+    # ---> daily refresh instead of a rerun: EFTsQuery.sync("CIK_SUBSIDIARIES_2024_JAN_01__2025_OCT_06.json")
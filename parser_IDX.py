@@ -1,68 +1,468 @@
 
+import gzip
+import io
+import os
+import pickle
+import re
+import tempfile
+import time
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 # dummy / fake import 
+from .edgar_cache import CacheMiss, IndexCache, ListingCache, atomic_write, current_quarter, is_closed_quarter
 from .entity_classification import ENTS
+from .entity_store import EntityStore, unpack_accession
+from .filing_index import FilingIndex
+from .instrumentation import RunStats
+from .spill import FAN_IN, SpilledEntities, merge_runs, store_records, write_run
+from .utilities import Request, TokenBucket, get_client, ordered_map, timed_fetch
+
+
+class IdxRecord(namedtuple("IdxRecord", "company form_type cik date_filed file_name")):
+    """ one data line of a company*.idx file """
+
+    __slots__ = ()
+
+    @property
+    def accs(self):
+        return ParserIDX.extract_acc(self.file_name)
+
+
+def _iter_lines(source):
+    """ lines (str, no line ending) of a response / file object / bytes / str / iterable """
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    elif isinstance(source, str):
+        source = io.StringIO(source)
+    elif hasattr(source, "iter_lines"):
+        # requests.Response(stream=True)
+        source = source.iter_lines()
+    elif not hasattr(source, "read") and hasattr(source, "content"):
+        source = io.BytesIO(source.content)
+
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="ignore")
+        yield line.rstrip("\r\n")
+
+
+# right-anchored fallback for lines the split below can't take: file name, date
+# and CIK are single tokens from the right, the form type is whatever follows
+# the *last* 2+ space gap of the rest
+_LOOSE_LINE = re.compile(r'^\s*(.*\S)\s{2,}(\S(?:.*?\S)?)\s+(\d+)\s+(\S+)\s+(\S+)\s*$')
+
+
+def _parse_loose(line):
+    """ IdxRecord or None -- header-less line, plain string splits, the regex only when they are ambiguous """
+
+    # CIK / date / file name from the right, then the form type after the last double space
+    parts = line.rsplit(None, 3)
+
+    if len(parts) == 4 and parts[1].isdigit():
+        company, gap, form_type = parts[0].rstrip().rpartition("  ")
+        company = company.strip()
+
+        if gap and company:
+            return IdxRecord(company, form_type.strip(), parts[1], parts[2], parts[3])
+
+    m = _LOOSE_LINE.match(line)
+    return IdxRecord._make(m.groups()) if m else None
+
+
+class IdxColumns:
+    """
+
+     Column layout of a fixed-width company*.idx file, read once from its header:
+
+        Company Name         Form Type   CIK         Date Filed  File Name
+        -------------------------------------------------------------------
+
+     parse_batch slices whole columns on those offsets, so names with inner double
+     spaces ("SENTRY MANAGEMENT INC          /ADV") survive. Line by line, the
+     company.idx layout goes through the right-anchored _parse_loose -- two string
+     splits beat five slices + strips per call, with the same records -- and only
+     other layouts (form.idx puts Form Type first) are sliced. A line whose CIK /
+     date slice is not numeric (e.g. a form type wider than its column pushed
+     everything right) goes through the right-anchored parser as well.
+
+    """
+
+    LABELS = {
+        "Company Name": "company",
+        "Form Type": "form_type",
+        "CIK": "cik",
+        "Date Filed": "date_filed",
+        "File Name": "file_name",
+    }
+
+    def __init__(self, header: str):
+
+        found = []
+
+        for label, field in self.LABELS.items():
+            pos = header.find(label)
+
+            if pos < 0:
+                raise Exception(f"Not an idx column header: {header!r}")
+
+            found.append((pos, field))
+
+        found.sort()
+
+        self.fields = tuple(f for _, f in found)
+        self.offsets = tuple(p for p, _ in found)
+        self.spans = tuple(zip(self.offsets, self.offsets[1:] + (None,)))
+
+        # position of each IdxRecord field within self.fields (form.idx puts Form Type first)
+        self._order = tuple(self.fields.index(f) for f in IdxRecord._fields)
+        self._cik = self.fields.index("cik")
+        self._date = self.fields.index("date_filed")
+
+        if self.fields == IdxRecord._fields:
+            # the company.idx layout -- CIK / date / file name are the last three tokens
+            self.parse_line = _parse_loose
+
+    @classmethod
+    def from_header(cls, header):
+        """ IdxColumns or None if the line is not a column header """
+
+        try:
+            return cls(header)
+        except Exception:
+            return None
+
+    def parse_line(self, line):
+        """ IdxRecord or None """
+
+        vals = [line[a:b].strip() for a, b in self.spans]
+
+        if not (vals[self._cik].isdigit() and vals[self._date].replace("-", "").isdigit()):
+            return _parse_loose(line)
+
+        o = self._order
+        return IdxRecord(vals[o[0]], vals[o[1]], vals[o[2]], vals[o[3]], vals[o[4]])
+
+    def parse_batch(self, text: str):
+        """
+
+         Parses the data part of a body into whole columns at once:
+
+            {"company": [str], "form_type": [str], "cik": array("q"),
+             "date_filed": array("l") (YYYYMMDD), "file_name": [str]}
+
+         One slice comprehension per column instead of one call per line. text is
+         decoded the way iter_idx_records decodes (utf-8), offsets count characters
+         -- both paths cut a non-ascii line on the same columns.
+
+        """
+
+        lines = [l for l in text.split("\n") if l.strip()]
+        (ca, cb), (da, db) = self.spans[self._cik], self.spans[self._date]
+
+        try:
+            # int() ignores the padding -- a misaligned line can't parse and sends us to the slow path
+            ciks = array("q", [int(l[ca:cb]) for l in lines])
+            dates = array("l", [int(l[da:db].replace("-", "")) for l in lines])
+
+        except ValueError:
+            return self._parse_batch_rows(lines)
+
+        out = {}
+
+        for (a, b), f in zip(self.spans, self.fields):
+            if f == "cik":
+                out[f] = ciks
+            elif f == "date_filed":
+                out[f] = dates
+            else:
+                out[f] = [l[a:b].strip() for l in lines]
+
+        return out
+
+    def _parse_batch_rows(self, lines):
+        """ slow path of parse_batch -- line by line, with the loose fallback """
+
+        out = {f: [] for f in IdxRecord._fields}
+
+        for line in lines:
+            record = self.parse_line(line)
+
+            if record is None:
+                continue
+
+            for f, v in zip(IdxRecord._fields, record):
+                out[f].append(v)
+
+        out["cik"] = array("q", map(int, out["cik"]))
+        out["date_filed"] = array("l", [int(d.replace("-", "")) for d in out["date_filed"]])
+
+        return out
+
+
+def parse_idx_columns(buf: bytes):
+    """
+
+     Batch mode: a whole company*.idx body (bytes) -> column arrays, see
+     IdxColumns.parse_batch. Returns None if there is no header / ---- marker.
+
+    """
+
+    # same decoding as _iter_lines -- the streaming and the batch path see the same characters
+    text = buf.decode("utf-8", errors="ignore")
+
+    marker = text.find("\n----")
+    if marker < 0:
+        return None
+
+    head = text[:marker].rstrip().rsplit("\n", 1)[-1]
+    columns = IdxColumns.from_header(head)
+
+    if columns is None:
+        return None
+
+    start = text.find("\n", marker + 1)
+    if start < 0:
+        return columns.parse_batch("")
+
+    return columns.parse_batch(text[start + 1:])
+
+
+def iter_idx_records(source, name=None):
+    """
+
+     Streams the records of one company*.idx file.
+
+     source: response, binary / text file object, bytes, str or any iterable of lines.
+     Header lines are skipped as they come in (up to the ---- marker), nothing
+     is read into memory as a whole, so this runs in constant memory. The line
+     right above the marker gives the column offsets (see IdxColumns).
+
+     name: only used in the warning if the ---- marker never shows up
 
+    """
 
-class Request:
-    # your request class wrapper for utilities
-    pass
+    lines = _iter_lines(source)
+    head = ""
+
+    for line in lines:
+        if line.startswith("----"):
+            break
+        if line.strip():
+            head = line
+    else:
+        print(f"Warning: Could not find data start marker in {name or source}")
+        return
+
+    columns = IdxColumns.from_header(head)
+    parse = columns.parse_line if columns else _parse_loose
+
+    for line in lines:
+
+        if not line.strip():
+            continue
+
+        record = parse(line)
+
+        if record is None:
+            continue
+
+        yield record
 
 
 class ParserIDX:
     """ Makes multi-register ready """
 
-    def __init__(self, start, end):
-        """ """
+    BASE = "https://www.sec.gov/Archives/edgar/"
+
+    # swap for your own wrapper (or the offline stand-in, see sec_stand_in.py)
+    request_cls = Request
+
+    SOURCES = ("daily", "full")
+
+    def __init__(self, start, end, workers=1, rate=None, cache_dir=None, listing_ttl=3600,
+                 cache_max_bytes=4 * 1024 ** 3, cache_only=False, source="daily",
+                 checkpoint=None, checkpoint_every=25, sinks=None, stats=None,
+                 memory_budget=None, spill_dir=None):
+        """
+
+         workers: number of concurrent fetches used by parse(); 1 == sequential
+         rate: requests / second of this parser, shared by all workers (SEC cap is 10);
+               None == only the process-wide budget of the shared HTTP client (utilities.get_client)
+         cache_dir: where listings + raw idx bodies are kept (default ~/.cache/palmy/edgar)
+         listing_ttl: seconds the open quarter's listing is reused before revalidating
+         cache_max_bytes: LRU cap of the compressed idx cache, None == unbounded
+         cache_only: never touch the network - whatever is not cached is skipped
+         source: "daily" - daily-index files only (~60 requests per quarter)
+                 "full"  - full-index/{year}/QTR{n}/company.gz per closed quarter,
+                           daily files only for the open quarter and the one that ended
+                           less than CLOSE_GRACE_DAYS ago (historic backfills)
+         checkpoint: file to persist processed idx urls + small_db to; parse() resumes from it
+         checkpoint_every: idx files between two checkpoint writes
+         sinks: objects with add_filing(cik, form_type, filed, accs) - every kept filing -,
+                add_entities(store) - the classified CIKs - and close(parser) at the end of
+                parse(), e.g. columnar.IdxColumnarSink, entity_db.EntityDB
+         stats: RunStats to record into (default: a fresh one, see self.stats)
+         memory_budget: bytes small_db may grow to (EntityStore.nbytes) before it is spilled
+                        to disk as a sorted run; parse() then finishes with an external merge
+                        and returns a SpilledEntities view instead of the store (see spill.py).
+                        With parse(processes=) it bounds this process only -- every worker
+                        still holds the partial store of its shard
+         spill_dir: where the runs go (default: next to the checkpoint, else a temp dir)
+
+         Nothing is requested here -- links are discovered lazily, see iter_links()
+
+        """
 
         self.counted__persons = 0
         self.counted__companies = 0
         self.counted__none = 0
         self.counted__flags = {}        # works diff. see classify()
 
-        print(f"=========== Requesting ================ ")
+        if source not in self.SOURCES:
+            raise Exception(f"source must be one of {self.SOURCES}, got: {source}")
 
-        self.small_db = {}
-        self.links = []
+        self.start = start
+        self.end = end
+        self.source = source
 
-        for year in range(start, end + 1):  # include end year
-            for quarter in range(1, 5):  # Q1–Q4
-                links = self._scrape_form_idx_links(year, quarter)  # should return a list
-                self.links.extend(links)  # flatten instead of append
+        # enough to rebuild an equivalent parser in a worker process (see parse(processes=))
+        self._config = dict(
+            start=start, end=end, workers=workers, rate=rate, cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes, cache_only=cache_only, source=source,
+        )
+
+        self.small_db = EntityStore()
+        self._links = None
+        self.sinks = list(sinks or ())
+        self.stats = stats or RunStats()
+
+        # CIKs whose classification input changed since the last classify()
+        self._touched = set()
+
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir or (checkpoint + ".spill" if checkpoint else None)
+        self.runs = []              # spilled run files, oldest first
+        self.done = {}              # processed idx url -> True, in processing order
+        self.watermark = None       # (year, quarter) of the last processed idx file
 
-        if not self.links:
-            raise Exception(f"No urls extracted for year: {start}, until: {end}")
+        # sinks get filings as they are found -- parse() turns it off when it continues an earlier run
+        self._stream_filings = True
+
+        self.workers = workers
+        self.limiter = TokenBucket(rate=rate) if rate else None
+        self.listings = ListingCache(cache_dir, ttl=listing_ttl)
+        self.cache = IndexCache(cache_dir, max_bytes=cache_max_bytes)
+        self.cache_only = cache_only
 
         print("=========== Done - Ready for Action ===============")
 
+    def iter_links(self, since=None):
+        """
+
+         yields the company*.idx urls quarter by quarter, listing each quarter only when reached
+
+         source="full": closed quarters come as one full-index company.gz each,
+         only the open quarter is read day by day
+
+         since: (year, quarter) - skip everything before it (incremental runs)
+
+        """
+
+        last = current_quarter()
+
+        for year in range(self.start, self.end + 1):  # include end year
+            for quarter in range(1, 5):  # Q1–Q4
+
+                if since and (year, quarter) < since:
+                    continue
+
+                # nothing published yet - don't even ask
+                if (year, quarter) > last:
+                    return
+
+                # closed quarter -> one bulk file, no listing needed -- unless an earlier run
+                # already read part of it day by day (it was open then): finish it that way.
+                # Within the grace days after quarter end the full index may still grow, so
+                # the quarter is read day by day then too.
+                if self.source == "full" and is_closed_quarter(year, quarter) and not self._read_daily(year, quarter):
+                    yield f"{self.BASE}full-index/{year}/QTR{quarter}/company.gz"
+                    continue
+
+                yield from self._scrape_form_idx_links(year, quarter)
+
+    def _read_daily(self, year, quarter):
+        """ True if a daily file of that quarter is in self.done """
+
+        prefix = f"{self.BASE}daily-index/{year}/QTR{quarter}/"
+        return any(url.startswith(prefix) for url in self.done)
+
+    @property
+    def links(self):
+        """ full list of urls - only materialized if somebody indexes into it """
+
+        if self._links is None:
+            print(f"=========== Requesting ================ ")
+            self._links = list(self.iter_links())
+
+            if not self._links:
+                raise Exception(f"No urls extracted for year: {self.start}, until: {self.end}")
+
+        return self._links
+
     @staticmethod
     def extract_acc(file_path: str) -> str:
         """Extract the accession number from the file path"""
         return os.path.splitext(os.path.basename(file_path))[0]
 
     @staticmethod
-    def parse_idx_line(line: str) -> dict:
+    def parse_idx_line(line: str, columns=None) -> dict:
         """
         Parse a single line from the .idx file based on the fixed-width format.
+
+        columns: IdxColumns of the file (offsets from its header); without them
+        the line is parsed right-anchored (file name / date / CIK are single
+        tokens, the form type follows the last 2+ space gap).
         """
         if not line.strip():
             return {}
 
-        # More robust parsing - split by multiple spaces and reconstruct
-        parts = re.split(r'\s{2,}', line.strip())  # Split on 2+ spaces
+        record = columns.parse_line(line) if columns else _parse_loose(line)
+
+        if record is None:
+            return {}
 
         return {
-            "form_type": parts[1],
-            "company_raw": parts[0],
-            "cik": parts[2],
-            "date_filed": parts[-2],
-            "file_name": parts[-1]
+            "form_type": record.form_type,
+            "company_raw": record.company,
+            "cik": record.cik,
+            "date_filed": record.date_filed,
+            "file_name": record.file_name
         }
 
     @staticmethod
-    def _scrape_form_idx_links(year: int, quarter: int) -> list:
+    def _header(response, name):
+        headers = getattr(response, "headers", None) or {}
+
+        for k, v in headers.items():
+            if k.lower() == name.lower():
+                return v
+
+        return None
+
+    def _scrape_form_idx_links(self, year: int, quarter: int) -> list:
         """
         Scrape SEC daily-index directory for all form*.idx files.
 
+        Goes through self.listings first: closed quarters never hit the network
+        twice, the open one is revalidated with a conditional request.
+
         Args:
             year (int): Full year (e.g., 1994, 2014, 2025).
             quarter (int): Quarter number (1–4).
@@ -71,11 +471,36 @@ class ParserIDX:
             list: URLs of all company*.idx files.
         """
 
-        base_url = f"https://www.sec.gov/Archives/edgar/daily-index/{year}/QTR{quarter}/"
-        response = Request(base_url).fetch(as_json=False)
+        base_url = f"{self.BASE}daily-index/{year}/QTR{quarter}/"
+
+        cached = self.listings.get(year, quarter)
+
+        if cached and (self.cache_only or self.listings.is_fresh(cached)):
+            self.stats.count("listing_hits")
+            return [base_url + link for link in cached["links"]]
+
+        if self.cache_only:
+            return []
+
+        headers = self.listings.conditional_headers(cached) if cached else {}
+        response = self._get(base_url, headers)
+
+        status = getattr(response, "status_code", None) or getattr(response, "status", 200)
+
+        if cached and status == 304:
+            self.listings.touch(year, quarter, cached)
+            return [base_url + link for link in cached["links"]]
 
         try:
-            html = response.text if hasattr(response, "text") else response.read().decode("utf-8", errors="ignore")
+            if status == 404:
+                # no such quarter (yet) -- cached as empty, so a closed one is never asked again
+                html = ""
+
+            elif status >= 400:
+                raise Exception(f"HTTP {status}")
+
+            else:
+                html = response.text if hasattr(response, "text") else response.read().decode("utf-8", errors="ignore")
         except Exception as E:
             print(f"{year} - {quarter} does not work:")
             print(base_url)
@@ -84,133 +509,579 @@ class ParserIDX:
         # Extract only company*.idx links
         links = re.findall(r'href="(company[^"]*?\.idx)"', html, re.IGNORECASE)
 
+        self.listings.put(
+            year, quarter, links,
+            etag=self._header(response, "ETag"),
+            last_modified=self._header(response, "Last-Modified"),
+        )
+
         # Build absolute URLs
         urls = [base_url + link for link in links]
 
         return urls 
 
+    def _get(self, url, headers=None):
+        """ one rate-limited request, timed into self.stats """
+
+        return timed_fetch(self.request_cls, url, self.limiter, self.stats, headers=headers)
+
+    def _open_idx(self, url):
+        """
+
+         One .idx body as a binary file object - streamed out of the local cache
+         if we have it, otherwise one rate-limited GET (which then lands in the
+         cache). Daily files and closed-quarter full-index files never change
+         once published, so a cached body is always valid.
+
+         Safe to call from worker threads. Raises CacheMiss in cache_only mode.
+
+        """
+
+        cached = self.cache.open(url)
+
+        if cached is not None:
+            self.stats.count("cache_hits")
+            return cached
+
+        self.stats.count("cache_misses")
+
+        if self.cache_only:
+            raise CacheMiss(url)
+
+        response = self._get(url)
+
+        status = getattr(response, "status_code", None) or getattr(response, "status", 200)
+        if status >= 400:
+            raise Exception(f"HTTP {status} for {url}")
+
+        if hasattr(response, "content"):
+            body = response.content
+        elif hasattr(response, "text"):
+            body = response.text.encode("utf-8")
+        else:
+            body = response.read()
+
+        if url.endswith(".gz"):
+            # full-index bulk file - keep it gzipped on disk and decode while streaming
+            self.cache.put(url, body, encoded="gzip")
+            return gzip.GzipFile(fileobj=io.BytesIO(body), mode="rb")
+
+        self.cache.put(url, body)
+
+        return io.BytesIO(body)
+
+    def _open_idx_or_skip(self, url):
+        """ _open_idx, but a cache miss in cache_only mode is a warning + None """
+
+        try:
+            return self._open_idx(url)
+        except CacheMiss:
+            print(f"Warning: {url} not cached - skipped (cache_only)")
+            return None
+
+    def _open_idx_concurrent(self, urls, workers):
+        """ (url, file object) in the same order as `urls`, up to `workers` downloads in the background (see ordered_map) """
+
+        # a cache_only miss comes back as (url, None) -- the callers skip it
+        return ordered_map(lambda url: (url, self._open_idx_or_skip(url)), urls, workers)
+
+    def iter_records(self, urls=None, workers=None):
+        """
+
+         Streams IdxRecords of every idx file in `urls` (default: iter_links()),
+         day after day in link order, without touching small_db.
+
+         Memory stays constant no matter how many days - plug in your own sink:
+
+            for rec in parser.iter_records():
+                my_sink.add(rec)
+
+        """
+
+        urls = self.iter_links() if urls is None else urls
+        workers = workers or self.workers
+
+        for url, source in self._open_idx_concurrent(urls, workers):
+            if source is None:
+                continue
+
+            with source:
+                yield from iter_idx_records(source, name=url)
+
     def parse_idx_day(self, enum):
         """ """ 
         url = self.links[enum]
+        self._ingest_idx(self._open_idx_or_skip(url), url)
+
+    def _ingest_idx(self, source, url):
+        """ merges one .idx body (file object) into small_db """
+
+        if source is None:
+            return
+
+        lines = 0
+
+        # spilled runs can repeat a CIK / form type - the final merge feeds the sinks then
+        emit = self.sinks and not self.memory_budget and self._stream_filings
 
-        response = Request(url).fetch(as_json=False)
-        text = response.text if hasattr(response, "text") else response.read().decode("utf-8", errors="ignore")
-        lines = text.splitlines()
+        # a full-index file is sorted by company, not date -- a kept filing can still be
+        # replaced by an earlier one further down, so its filings go out once the file is done
+        bulk = url.endswith(".gz")
+        kept = len(self.small_db.f_type)
+        changed_ciks = {}
 
-        # Find the start of data (after the dashed line)
-        start_index = 0
-        for i, line in enumerate(lines):
-            if line.startswith("----"):
-                start_index = i + 1
-                break
+        with self.stats.stage("parse"), source:
+            for record in iter_idx_records(source, name=url):
+                changed = self._ingest_record(record)
+                lines += 1
 
-        if start_index == 0:
-            print(f"Warning: Could not find data start marker in {url}")
+                # EARLIER only moves a filing the sinks already have a row for (CIK + form type)
+                if not emit or changed not in (EntityStore.NEW_CIK, EntityStore.NEW_FORM):
+                    continue
+
+                cik = int(record.cik)
+
+                if bulk:
+                    changed_ciks[cik] = True
+                else:
+                    for sink in self.sinks:
+                        sink.add_filing(cik, record.form_type, record.date_filed, record.accs)
+
+        for cik in changed_ciks:
+            self._emit_filings(cik, kept)
+
+        self.stats.count("lines", lines)
+        self.stats.count("idx_files")
+        self.stats.peak("entities", len(self.small_db))
+
+    def _ingest_record(self, record):
+        """ the small_db sink - one IdxRecord in, returns what EntityStore.add() did with it """
+
+        # idea as we use company.idx now
+        # keep one main body :
+        # cik: {"name": ... and new: add forms: [] <... using later for flags on create or if cik in DB flagship !}
+        # -- only the earliest filing per form type is kept (new form type == regime info)
+
+        cik = int(record.cik)
+
+        changed = self.small_db.add(
+            cik,
+            record.company,
+            record.form_type,
+            # full-index writes 2024-06-03, daily-index 20240603 - both end up as YYYYMMDD
+            record.date_filed,
+            record.accs,
+        )
+
+        if changed == EntityStore.NEW_CIK:
+            # Doing the classification at the end with full forms= backup
+            self._touched.add(cik)
+
+        elif changed:
+            # NEW_FORM or EARLIER -- the form sequence changed
+            self._touch(cik)
+
+        return changed
+
+    def _touch(self, cik):
+        """ forms of an existing CIK changed -> it gets classified again """
+
+        if cik in self._touched:
             return
 
-        # Parse each data line
-        for line_num, line in enumerate(lines[start_index:], start_index + 1):
+        # everything outside _touched is classified + counted -- take it out of the count
+        self._tally(self.small_db.entity(cik), -1)
+        self._touched.add(cik)
 
-            if not line.strip():
-                continue
+    def _tally(self, ent, delta):
+        if ent is None:
+            self.counted__none += delta
 
-            parsed = self.parse_idx_line(line)
+        elif ent == "Company":
+            self.counted__companies += delta
 
-            if not parsed:
-                continue
+        elif ent == "Person":
+            self.counted__persons += delta
+
+        else:
+            # flags
+            self.counted__flags[ent] = self.counted__flags.get(ent, 0) + delta
 
-            # Extract accession number
-            accs = self.extract_acc(parsed["file_name"])
+            if not self.counted__flags[ent]:
+                del self.counted__flags[ent]
 
-            # idea as we use company.idx now
-            # keep one main body :
-            # cik: {"name": ... and new: add forms: [] <... using later for flags on create or if cik in DB flagship !}
+    @staticmethod
+    def _quarter_of(url):
+        m = re.search(r'/(\d{4})/QTR(\d)/', url)
+        return (int(m.group(1)), int(m.group(2))) if m else None
 
-            cik = parsed["cik"]
+    def load_checkpoint(self):
+        """ restores small_db, counters and the processed urls; False if there is none """
 
-            # --- our current code was written for company.idx on the -- parse_idx_line level
-            # so just swap these two and it works --- skipped the rework here
-            name = parsed["company_raw"]
-            ft = parsed["form_type"]
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return False
 
-            form = {
-                "accs": accs,
-                "filed": parsed["date_filed"],
-                "type": ft
-            }
+        with open(self.checkpoint, "rb") as f:
+            state = pickle.load(f)
 
-            if not self.small_db.get(cik):
-                self.small_db[cik] = {
-                    "original_name": name,
-                    "other_names": [],
-                #    Doing this at the end with full forms= backup
-                    "entity": None,
+        self.small_db = state["small_db"]
+        self.runs = state.get("runs", [])
+        self.done = state["done"]
+        self.watermark = state["watermark"]
+        self._touched = state["touched"]
 
-                    "forms": [form]
-                }
-                continue
+        self.counted__persons = state["counted__persons"]
+        self.counted__companies = state["counted__companies"]
+        self.counted__none = state["counted__none"]
+        self.counted__flags = state["counted__flags"]
+
+        print(f"=========== Resumed {len(self.done)} idx files / {len(self.small_db)} CIKs from {self.checkpoint} ===")
+        return True
+
+    def save_checkpoint(self):
+        """ atomic snapshot - a crash while writing leaves the previous one intact """
+
+        if not self.checkpoint:
+            return
+
+        state = {
+            "small_db": self.small_db,
+            "runs": self.runs,
+            "done": self.done,
+            "watermark": self.watermark,
+            "touched": self._touched,
+            "counted__persons": self.counted__persons,
+            "counted__companies": self.counted__companies,
+            "counted__none": self.counted__none,
+            "counted__flags": self.counted__flags,
+        }
+
+        atomic_write(self.checkpoint, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def _mark_done(self, url):
+        self.done[url] = True
+
+        quarter = self._quarter_of(url)
+        if quarter and (not self.watermark or quarter > self.watermark):
+            self.watermark = quarter
+
+        if self.memory_budget and self.small_db.nbytes() > self.memory_budget:
+            self._spill()
+
+        if self.checkpoint and len(self.done) % self.checkpoint_every == 0:
+            self.save_checkpoint()
+
+    def _spill_path(self, kind):
+        """ new run file name in spill_dir -- the (temp) dir is made on first use """
+
+        if not self.spill_dir:
+            self.spill_dir = tempfile.mkdtemp(prefix="palmy-spill-")
+
+        os.makedirs(self.spill_dir, exist_ok=True)
+        return os.path.join(self.spill_dir, f"{kind}-{os.getpid()}-{int(time.time() * 1000)}.run")
+
+    def _spill(self):
+        """ small_db -> next sorted run file on disk, parsing goes on with an empty store """
+
+        if not len(self.small_db):
+            return
+
+        path = self._spill_path(f"run-{len(self.runs):05d}")
+        n = write_run(path, store_records(self.small_db))
+
+        self.runs.append(path)
+        self.stats.count("spilled_runs")
+        print(f"=========== Spilled {n} CIKs to {path} ===")
+
+        if len(self.runs) >= FAN_IN:
+            # keep the final merge at a bounded number of open runs (and buffers)
+            compacted = self._spill_path("compacted")
+            write_run(compacted, merge_runs(self.runs))
+            old, self.runs = self.runs, [compacted]
+            self.save_checkpoint()
+
+            for p in old:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+
+        self.small_db = EntityStore()
+        self._touched = set()
+
+        # the run is on disk - the checkpoint has to know about it before the old store is gone
+        self.save_checkpoint()
+
+    def _finish_spilled(self, processes=None, chunk=50_000):
+        """
+
+         External k-way merge of all runs by CIK, classified chunk by chunk -- memory
+         stays at one chunk whatever the number of CIKs. Sinks get the merged filings /
+         entities here. The merged file is the only run afterwards, so an incremental
+         run merges its new runs into it next time.
+
+         Counters are recounted from scratch (every CIK is classified again).
+
+        """
+
+        self._spill()
+
+        self.counted__persons = 0
+        self.counted__companies = 0
+        self.counted__none = 0
+        self.counted__flags = {}
+
+        def classified():
+            store = EntityStore()
+
+            for cik, names, _, filings in merge_runs(self.runs):
+                store.add_record(cik, names, filings)
+
+                if len(store) >= chunk:
+                    yield from self._classify_chunk(store, processes)
+                    store = EntityStore()
+
+            if len(store):
+                yield from self._classify_chunk(store, processes)
+
+        path = self._spill_path("merged")
+        n = write_run(path, classified())
 
-            record = self.small_db[cik]
-            names = ["original_name"] + record["other_names"]
+        old, self.runs = self.runs, [path]
+        self.save_checkpoint()
 
-            if name not in names:
-                # -- tracking name changes per CIK --- e.g. Zuckerberg Max --- Zuckerberg Marx
-                self.small_db[cik]["other_names"].append(name)
+        for p in old:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
 
-            fts = [f.get("type") for f in record["forms"]]
+        print(f"=========== Merged {len(old)} runs into {n} CIKs: {path} ===")
+        return SpilledEntities(path, n)
 
-            # already part
-            if ft not in fts:
-                # new form type == regime info
-                self.small_db[cik]["forms"].append(form)
+    def _classify_chunk(self, store, processes=None):
+        """ classifies one merged chunk, hands it to the sinks, yields its run records """
 
-    def parse(self, describe=False, safety=45):
-        """ """
+        self.classify(store.iter_ciks(), processes=processes, store=store)
+        self.stats.peak("entities", len(store))
+
+        for cik in store.iter_ciks():
+            for form_type, filed, accs in store.filings(cik):
+                for sink in self.sinks:
+                    sink.add_filing(cik, form_type, filed, accs)
+
+        for sink in self.sinks:
+            sink.add_entities(store)
+
+        yield from store_records(store)
+
+    def parse(self, describe=False, safety=45, workers=None, incremental=False, processes=None):
+        """
+
+         workers: overrides self.workers for this run
+         incremental: only idx files newer than the last run (needs a checkpoint);
+                      listing starts at the watermark quarter, already processed
+                      files are skipped and only CIKs with new forms are classified again
+         processes: > 1 shards the idx files over a process pool (see _parse_sharded)
+
+         With workers > 1 the downloads run concurrently, but the bodies are still
+         merged one by one in link order -- small_db ends up identical to the
+         sequential run (first seen name wins, earliest filing per form type).
+
+         With a checkpoint, a crashed run simply continues where it stopped
+         when parse() is called again.
+
+         Sinks write whole tables: a resumed / incremental run hands them every
+         filing of small_db at the end, not only the ones found in this process.
+
+        """
+
+        resumed = self.load_checkpoint() if not self.done else True
+
+        if incremental and not resumed:
+            print("Warning: incremental=True without a checkpoint to start from - full run")
+
+        # filings of the earlier run(s) are in small_db only -- stream nothing, emit the store at the end
+        self._stream_filings = not resumed
+
+        since = self.watermark if incremental else None
+        links = (url for url in self.iter_links(since) if url not in self.done)
 
         # your TODO - add a safety guard or set it to None if your PC dont crash otherwise :D
-        links = self.links[:safety] if safety else self.links[:safety]
+        # links are listed lazily -- with a safety guard we stop listing quarters once it is reached
+        # (with a memory_budget small_db spills to disk instead - safety=None is fine then)
+        links = islice(links, safety) if safety else links
+
+        workers = workers or self.workers
+        seen = 0
+
+        if processes and processes > 1 and self.memory_budget:
+            print("Warning: memory_budget bounds the merged store only - shard workers build theirs in memory")
+
+        if processes and processes > 1:
+            seen = self._parse_sharded(list(links), processes, workers)
+
+        else:
+            for url, source in self._open_idx_concurrent(links, workers):
+                self._ingest_idx(source, url)
+                self._mark_done(url)
+                seen += 1
+
+        if not seen and not self.done:
+            raise Exception(f"No urls extracted for year: {self.start}, until: {self.end}")
 
-        # :10 while testing
-        for i, _ in enumerate(links):
-            self.parse_idx_day(i)
+        if self.memory_budget:
+            result = self._finish_spilled(processes)
 
-        # classify ents
-        self.classify()
+        else:
+            # classify ents
+            self.classify(self._touched, processes=processes)
+            self.save_checkpoint()
+
+            if self.sinks and not self._stream_filings:
+                for cik in self.small_db.iter_ciks():
+                    self._emit_filings(cik, 0)
+
+            for sink in self.sinks:
+                sink.add_entities(self.small_db)
+
+            result = self.small_db
+
+        for sink in self.sinks:
+            sink.close(self)
+
+        if self.stats.profile:
+            self.stats.dump_profiles()
 
         if not describe:
-            return self.small_db
+            return result
 
-        self.describe()
+        self.describe(result)
 
-    def classify(self):
-        """ calls ENTS.classify() with forms on each unique CIK """
+    def _parse_sharded(self, links, processes, workers):
+        """
 
-        for k in self.small_db.keys():
-            vals = self.small_db[k]
-            types = [i["type"] for i in vals["forms"]]
-            ent = ENTS.classify(vals["original_name"], forms=types)
-            self.small_db[k]["entity"] = ent
+         Map-reduce over a process pool, no broker needed:
 
-            if ent is None:
-                self.counted__none += 1
+          - map: links are cut into consecutive shards, each worker process
+            builds a partial EntityStore for its shard (no classification)
+          - reduce: partials are merged back in shard order with
+            EntityStore.merge -- associative and first-seen preserving, so the
+            result equals the sequential run
 
-            elif ent == "Company":
-                self.counted__companies += 1
+         The request budget is split evenly: every process gets rate / processes.
+         Listings come from this process, idx bodies go through the shared cache dir.
 
-            elif ent == "Person":
-                self.counted__persons += 1
+        """
 
-            else:
-                # flags
-                if self.counted__flags.get(ent):
-                    self.counted__flags[ent] += 1
-                else:
-                    self.counted__flags[ent] = 1
+        if not links:
+            return 0
+
+        # a few shards per process keeps the pool balanced when some quarters are heavier
+        size = max(1, -(-len(links) // (processes * 4)))
+        shards = [links[i:i + size] for i in range(0, len(links), size)]
+
+        # worker processes have their own shared client -- give each an explicit share
+        rate = self._config["rate"] or get_client().limiter.max_rate
+        config = dict(self._config, workers=workers, rate=rate / processes)
+        jobs = [(config, self.BASE, self.request_cls, shard) for shard in shards]
+
+        print(f"=========== {len(links)} idx files in {len(shards)} shards on {processes} processes ===")
+
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+
+            # map() yields in submission order -> deterministic reduce
+            for shard, (part, stats) in zip(shards, pool.map(_parse_shard, jobs)):
+
+                self.stats.merge(stats)
+
+                kept = len(self.small_db.f_type)
+
+                for cik, status in self.small_db.merge(part):
+                    if status == EntityStore.NEW_CIK:
+                        self._touched.add(cik)
+                    else:
+                        self._touch(cik)
+
+                    if self.sinks and not self.memory_budget and self._stream_filings:
+                        self._emit_filings(cik, kept)
+
+                for url in shard:
+                    self._mark_done(url)
 
-    def describe(self):
-        """ """
+                self.stats.peak("entities", len(self.small_db))
 
-        for k, i in self.small_db.items():
+        return len(links)
+
+    def _emit_filings(self, cik, since):
+        """ hands the filings of cik stored at index >= since to the sinks """
+
+        db = self.small_db
+
+        for i in db._filings(db.row(cik)):
+            if i < since:
+                continue
+
+            accs = db.raw_accs.get(i) or unpack_accession(db.f_acc[i])
+
+            for sink in self.sinks:
+                sink.add_filing(cik, db.form_types[db.f_type[i]], db.f_date[i], accs)
+
+    def classify(self, ciks=None, processes=None, store=None):
+        """
+
+         classifies each unique CIK by name + forms in one ENTS.classify_many() batch
+         (names / form sequences shared by many CIKs, e.g. fund series, run once)
+
+         ciks: only these (default: all) -- parse() passes the ones whose forms changed
+         processes: passed on to classify_many for the regex pass
+         store: classify this EntityStore instead of small_db (spilled chunks)
+
+        """
+
+        db = self.small_db if store is None else store
+        keys = list(db.iter_ciks() if ciks is None else ciks)
+
+        with self.stats.stage("classify"):
+            ents = ENTS.classify_many(((db.original_name(k), db.forms_of(k)) for k in keys), processes=processes)
+
+        self.stats.count("classify_calls", len(keys))
+
+        for k, ent in zip(keys, ents):
+
+            if isinstance(ent, list):
+                # flags come back as a list -- tuple keeps them hashable for the counter
+                ent = tuple(ent)
+
+            db.set_entity(k, ent)
+            self._tally(ent, 1)
+
+        if ciks is self._touched:
+            self._touched = set()
+
+    def filing_index(self, db=None):
+        """
+
+         query indexes (form type / date range / CIK), see filing_index.py
+
+         default: every filing of the idx files parse() processed, streamed again
+         out of the idx cache (iter_records) -- not just the ones small_db keeps
+         db: index that store instead (what parse() returned) -- earliest filing
+             per CIK and form type only
+
+        """
+
+        if db is not None:
+            return FilingIndex.from_store(db)
+
+        return FilingIndex.from_idx_records(self.iter_records(urls=list(self.done)))
+
+    def describe(self, db=None):
+        """ db: what parse() returned (default small_db) """
+
+        db = self.small_db if db is None else db
+
+        for k, i in db.items():
             print(i["entity"], i["original_name"])
 
         # print summary
@@ -226,17 +1097,36 @@ class ParserIDX:
             print(f"  {flag}: {count}")
 
         print("TOTAL: ")
-        print(len(self.small_db))
+        print(len(db))
+
+        self.stats.print_summary()
 
         print("============ CLOSED ==============")
 
 
+def _parse_shard(job):
+    """ process pool worker: a fresh parser over one shard of urls -> its partial EntityStore + RunStats """
+
+    config, base, request_cls, urls = job
+
+    parser = ParserIDX(**config)
+    parser.BASE = base
+    parser.request_cls = request_cls
+
+    for url, source in parser._open_idx_concurrent(urls, parser.workers):
+        parser._ingest_idx(source, url)
+
+    return parser.small_db, parser.stats
+
+
 # ---------- idx
 
-start = 2024
-end = 2025
+if __name__ == "__main__":
+
+    start = 2024
+    end = 2025
 
-ParserIDX(start=start, end=end).parse(describe=True)
+    ParserIDX(start=start, end=end, workers=8).parse(describe=True)
 
 """
 
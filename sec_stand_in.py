@@ -0,0 +1,613 @@
+"""
+
+ Local stand-in for www.sec.gov -- serves in-memory files over real HTTP so the
+ fetch paths (concurrency, ordering, rate limits) can be exercised offline.
+
+ Usage:
+
+    files = {
+        "daily-index/2024/QTR1/": listing_html(["company.20240102.idx"]),
+        "daily-index/2024/QTR1/company.20240102.idx": company_idx([...], "20240102"),
+    }
+
+    with SECStandIn(files, latency=0.05) as sec:
+        ParserIDX.BASE = sec.base_url
+        ParserIDX.request_cls = StandInRequest
+        ...
+        sec.log   # [(path, t_start, t_end), ...] in arrival order
+
+"""
+
+import datetime
+import gzip
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInResponse:
+    """ minimal response object -- has .text like the wrappers ParserIDX expects """
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="ignore")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class StandInRequest:
+    """ urllib based Request replacement, good enough for localhost """
+
+    def __init__(self, url):
+        self.url = url
+
+    def fetch(self, as_json=False, headers=None):
+        request = urllib.request.Request(self.url, headers=headers or {})
+
+        try:
+            with urllib.request.urlopen(request) as r:
+                response = StandInResponse(r.status, r.read(), dict(r.headers))
+
+        except urllib.error.HTTPError as e:
+            # 304 / 404 / 5xx are answers too -- hand them back like requests would
+            response = StandInResponse(e.code, e.read(), dict(e.headers))
+
+        if as_json:
+            return response.json()
+
+        return response
+
+
+class SECStandIn:
+    """ threaded HTTP server over a {path: bytes | str} mapping """
+
+    def __init__(self, files, latency=0.0, host="127.0.0.1", port=0, throttle_over=None):
+        """
+        Args:
+            files: relative path (below base_url, query string included) -> body;
+                   a dict or anything with .get(path), e.g. SyntheticEdgar
+            latency: seconds slept per request, to mimic the round trip to sec.gov
+            port: 0 picks a free port
+            throttle_over: answer 429 once more than this many requests arrived
+                           within the last second (like sec.gov's fair access limit)
+        """
+
+        if isinstance(files, dict):
+            files = {k: v.encode("utf-8") if isinstance(v, str) else v for k, v in files.items()}
+
+        self.files = files
+        self.latency = latency
+        self.throttle_over = throttle_over
+        self.log = []
+        self.throttled = 0
+        self._starts = []
+
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            # keep-alive, like the real thing
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                started = time.monotonic()
+                path = self.path.lstrip("/")
+
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+
+                if stand_in.throttle_over and stand_in._recent(started) > stand_in.throttle_over:
+                    self.send_response(429)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                body = stand_in.files.get(path)
+
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+
+                etag = body is not None and '"%s"' % hashlib.sha1(body).hexdigest()
+
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                elif self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                else:
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+
+                    if "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                        body = gzip.compress(body, compresslevel=1)
+                        self.send_header("Content-Encoding", "gzip")
+
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                with stand_in._lock:
+                    stand_in.log.append((path, started, time.monotonic()))
+
+            def log_message(self, *args):
+                # silence the default stderr access log
+                pass
+
+        return Handler
+
+    def _recent(self, now):
+        """ counts this request, returns how many started within the last second """
+
+        with self._lock:
+            self._starts = [t for t in self._starts if now - t < 1.0] + [now]
+
+            if len(self._starts) > self.throttle_over:
+                self.throttled += 1
+
+            return len(self._starts)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def requests_per_second(self):
+        """ peak number of requests that started within any 1s window """
+
+        starts = sorted(t for _, t, _ in self.log)
+        peak, lo = 0, 0
+
+        for hi, t in enumerate(starts):
+            while t - starts[lo] >= 1.0:
+                lo += 1
+            peak = max(peak, hi - lo + 1)
+
+        return peak
+
+
+def listing_html(names):
+    """ directory listing the way sec.gov renders it (only the hrefs matter) """
+
+    rows = "\n".join(f'<tr><td><a href="{n}">{n}</a></td></tr>' for n in names)
+    return f"<html><body><table>\n{rows}\n</table></body></html>"
+
+
+def company_idx(rows, date):
+    """
+
+     Renders a company.idx body in the fixed-width layout of the daily index.
+
+     rows: iterable of (company, form_type, cik, file_name) -- or (..., file_name, date)
+           with a per row date (full-index files span a quarter)
+
+    """
+
+    head = (
+        "Description:           Daily Index of EDGAR Dissemination Feed by Company Name\n"
+        f"Last Data Received:    {date}\n"
+        "Comments:              webmaster@sec.gov\n"
+        "Anonymous FTP:         ftp://ftp.sec.gov/edgar/\n"
+        "\n\n\n"
+        f"{'Company Name':<62}{'Form Type':<12}{'CIK':<12}{'Date Filed':<12}File Name\n"
+        + "-" * 141 + "\n"
+    )
+
+    body = "".join(
+        f"{row[0][:60]:<62}{row[1]:<11} {row[2]:<11} {row[4] if len(row) > 4 else date:<11} {row[3]}\n"
+        for row in rows
+    )
+
+    return head + body
+
+
+# ---------- synthetic corpus
+
+class SyntheticEdgar:
+    """
+
+     Deterministic, lazily generated EDGAR tree to put behind SECStandIn:
+
+        daily-index/{year}/QTR{n}/                    listing of company.YYYYMMDD.idx (business days)
+        daily-index/{year}/QTR{n}/company.*.idx       one day, sorted by company like the real ones
+        full-index/{year}/QTR{n}/company.gz           the closed quarter in one gzip body
+        LATEST/search-index?fileType=..&startdt=..&enddt=..&from=..
+                                                      EFTS exhibit search pages (100 hits, capped
+                                                      at MAX_HITS like the real endpoint)
+
+     Nothing is held in memory but the entity universe -- every body is rebuilt from
+     (seed, path) on request, so 30 years cost the same RAM as one.
+
+     The universe: `entities` filers of four kinds with their own form mix (persons
+     file 3/4/144, funds N-*/497, foreign issuers 6-K/20-F ...). Activity is skewed,
+     a few filers file a lot, the long tail rarely -- roughly like EDGAR.
+
+    """
+
+    KINDS = (("person", 45), ("company", 40), ("fund", 12), ("foreign", 3))
+
+    FORMS = {
+        "person": (("4", 70), ("3", 8), ("5", 3), ("144", 10), ("4/A", 4), ("SC 13G", 3), ("SC 13D/A", 2)),
+        "company": (("8-K", 25), ("424B2", 15), ("10-Q", 10), ("D", 10), ("SC 13G/A", 8), ("13F-HR", 6),
+                    ("10-K", 4), ("DEF 14A", 3), ("S-1", 1), ("N-2", 0.3), ("S-11", 0.2)),
+        "fund": (("NPORT-P", 30), ("497K", 20), ("485BPOS", 20), ("N-MFP2", 15), ("N-CSR", 10),
+                 ("497", 10), ("N-1A", 1)),
+        "foreign": (("6-K", 70), ("20-F", 10), ("SC 13G", 5), ("40-F", 3), ("F-1", 2)),
+    }
+
+    # exhibit type -> average hits per business day (10-K season weighs Feb / Mar x4)
+    EXHIBITS = {"EX-21.1": 12, "EX-21": 3, "EX-10.1": 40, "EX-99.1": 150}
+
+    AGENTS = (950170, 1193125, 1213900, 1104659, 1628280, 1140361, 1654954, 1493152)
+
+    LAST = ("SMITH", "JOHNSON", "WILLIAMS", "BROWN", "JONES", "MILLER", "DAVIS", "GARCIA", "WILSON",
+            "ANDERSON", "TAYLOR", "THOMAS", "MOORE", "MARTIN", "LEE", "WHITE", "HARRIS", "CLARK",
+            "LEWIS", "WALKER", "YOUNG", "KING", "WRIGHT", "SCOTT", "GREEN", "BAKER", "ADAMS", "NELSON")
+    FIRST = ("JAMES", "MARY", "ROBERT", "PATRICIA", "JOHN", "JENNIFER", "MICHAEL", "LINDA", "DAVID",
+             "ELIZABETH", "WILLIAM", "SUSAN", "RICHARD", "KAREN", "JOSEPH", "NANCY", "THOMAS", "LISA")
+    WORDS = ("CAPITAL", "PARTNERS", "HOLDINGS", "GLOBAL", "ENERGY", "BANCORP", "TECHNOLOGIES",
+             "PHARMACEUTICALS", "THERAPEUTICS", "RESOURCES", "ACQUISITION", "REALTY", "FINANCIAL",
+             "AMERICAN", "PACIFIC", "ATLANTIC", "NORTHERN", "SUMMIT", "PINNACLE", "BLUE", "RIVER",
+             "OAK", "EAGLE", "FIRST", "UNITED", "MEDICAL", "SYSTEMS", "NETWORKS", "MINING", "FOODS")
+    SUFFIXES = ("INC", "INC.", "CORP", "CORP.", "LLC", "LP", "L.P.", "CO", "HOLDINGS INC", "INC /DE/",
+                "TRUST", "GROUP INC", "LTD", "/ADV")
+    FOREIGN = ("PLC", "AG", "S.A.", "N.V.", "Ltd", "SE", "ASA", "Oyj", "AB (publ)", "K.K.")
+
+    MAX_HITS = 10_000
+    PAGE = 100
+
+    JURISDICTIONS = ("Delaware", "Nevada", "New York", "California", "Texas", "Maryland", "Cayman Islands",
+                     "United Kingdom", "Luxembourg", "Netherlands", "Ireland", "Bermuda", "Canada",
+                     "Germany", "Singapore", "Japan", "British Virgin Islands", "Hong Kong")
+
+    def __init__(self, start=2024, end=None, filings_per_day=2000, entities=40_000, seed=7, today=None):
+        """
+        Args:
+            start, end: years with data (end default: start)
+            filings_per_day: idx rows per business day
+            entities: size of the filer universe
+            seed: same seed -> byte identical corpus
+            today: date the corpus "ends" (default: today) - decides the open quarter
+        """
+
+        self.start = start
+        self.end = end or start
+        self.filings_per_day = filings_per_day
+        self.seed = seed
+        self.today = today or datetime.date.today()
+
+        self.entities = [self._entity(i) for i in range(entities)]
+        self._forms = {
+            kind: (tuple(f for f, _ in forms), tuple(itertools.accumulate(w for _, w in forms)))
+            for kind, forms in self.FORMS.items()
+        }
+        self._issuers = [i for i, e in enumerate(self.entities) if e[1] in ("company", "foreign")]
+
+    # ------------------------------------------------------------- universe
+
+    def _rnd(self, *key):
+        return random.Random("-".join(str(k) for k in (self.seed,) + key))
+
+    def _entity(self, i):
+        """ (cik, kind, name, later name or None) """
+
+        rnd = self._rnd("entity", i)
+        kind = rnd.choices([k for k, _ in self.KINDS], [w for _, w in self.KINDS])[0]
+        cik = 1_000_000 + i * 7 + rnd.randint(0, 6)
+
+        if kind == "person":
+            name = f"{rnd.choice(self.LAST)} {rnd.choice(self.FIRST)}"
+            if rnd.random() < 0.6:
+                name += f" {chr(65 + rnd.randint(0, 25))}"
+            if rnd.random() < 0.1:
+                name = name.title()
+
+        elif kind == "fund":
+            family = " ".join(rnd.sample(self.WORDS, 2))
+            name = rnd.choice((
+                f"{family} FUNDS TRUST",
+                f"{family} Series {rnd.randint(1, 40)}, a Series of {family} Trust",
+                f"{family} MONEY MARKET FUND",
+                f"{family} INCOME FUND",
+            ))
+
+        elif kind == "foreign":
+            name = f"{' '.join(rnd.sample(self.WORDS, rnd.randint(1, 2))).title()} {rnd.choice(self.FOREIGN)}"
+
+        else:
+            name = f"{' '.join(rnd.sample(self.WORDS, rnd.randint(1, 3)))} {rnd.choice(self.SUFFIXES)}"
+
+        # a few filers change names along the way
+        renamed = f"{name.split(' ')[0]} {rnd.choice(self.WORDS)} {rnd.choice(self.SUFFIXES)}" if kind == "company" and rnd.random() < 0.03 else None
+
+        return cik, kind, name, renamed
+
+    def _pick(self, rnd, pool=None):
+        """ skewed pick -- low indices file a lot """
+
+        n = len(pool) if pool is not None else len(self.entities)
+        i = int(n * rnd.random() ** 2.5)
+        return pool[i] if pool is not None else i
+
+    # ------------------------------------------------------------- calendar
+
+    def business_days(self, year, quarter):
+        """ published days of a quarter (weekdays before self.today) """
+
+        day = datetime.date(year, quarter * 3 - 2, 1)
+        out = []
+
+        while day.month <= quarter * 3 and day.year == year and day < self.today:
+            if day.weekday() < 5:
+                out.append(day)
+            day += datetime.timedelta(days=1)
+
+        return out
+
+    def _is_closed(self, year, quarter):
+        return (year, quarter) < (self.today.year, (self.today.month - 1) // 3 + 1)
+
+    # ------------------------------------------------------------- idx
+
+    def day_rows(self, day):
+        """ [(company, form_type, cik, file_name)] of one day, sorted by company """
+
+        rnd = self._rnd("day", day.isoformat())
+        yy = day.year % 100
+        doy = day.timetuple().tm_yday
+        per_agent = self.filings_per_day // len(self.AGENTS) + 1
+
+        rows = []
+
+        for j in range(self.filings_per_day):
+            cik, kind, name, renamed = self.entities[self._pick(rnd)]
+
+            if renamed and day.year > (self.start + self.end) // 2:
+                name = renamed
+
+            forms, weights = self._forms[kind]
+            form_type = rnd.choices(forms, cum_weights=weights)[0]
+
+            agent = self.AGENTS[j % len(self.AGENTS)]
+            accs = f"{agent:010d}-{yy:02d}-{(doy * per_agent + j // len(self.AGENTS)) % 1_000_000:06d}"
+
+            rows.append((name, form_type, str(cik), f"edgar/data/{cik}/{accs}.txt"))
+
+        rows.sort()
+        return rows
+
+    def daily_idx(self, day):
+        return company_idx(self.day_rows(day), day.strftime("%Y%m%d"))
+
+    def full_idx(self, year, quarter):
+        """ company.gz of a closed quarter -- dates as YYYY-MM-DD like the real full-index """
+
+        rows = []
+
+        for day in self.business_days(year, quarter):
+            rows.extend(row + (day.isoformat(),) for row in self.day_rows(day))
+
+        rows.sort()
+        return gzip.compress(company_idx(rows, "").encode("utf-8"), compresslevel=1)
+
+    # ------------------------------------------------------------- EFTS
+
+    def _exhibit_count(self, file_type, day):
+        if day.weekday() >= 5:
+            return 0
+
+        rate = self.EXHIBITS.get(file_type, 0) * (4 if day.month in (2, 3) else 1)
+        rnd = self._rnd("efts-n", file_type, day.isoformat())
+
+        return int(rnd.uniform(0.5, 1.5) * rate)
+
+    def _exhibit_hits(self, file_type, day):
+        rnd = self._rnd("efts", file_type, day.isoformat())
+        yy = day.year % 100
+        tag = file_type.lower().replace("-", "").replace(".", "")
+        hits = []
+
+        for j in range(self._exhibit_count(file_type, day)):
+            i = self._pick(rnd, self._issuers)
+            ciks = [self.entities[i][0]]
+
+            if rnd.random() < 0.04:
+                # joint filing -- parent + co-registrant(s) from the same neighbourhood
+                ciks += [self.entities[self._issuers[(self._issuers.index(i) + k) % len(self._issuers)]][0]
+                         for k in range(1, rnd.randint(2, 3))]
+
+            accs = f"{rnd.choice(self.AGENTS):010d}-{yy:02d}-{rnd.randint(0, 999_999):06d}"
+            doc = f"d{rnd.randint(100_000, 999_999)}d{tag}.htm"
+
+            # the search is fuzzy on fileType - a few neighbours slip through
+            shown = file_type if rnd.random() > 0.02 else ("EX-21" if file_type == "EX-21.1" else file_type + ".1")
+
+            hits.append({
+                "_id": f"{accs}:{doc}",
+                "_source": {
+                    "ciks": [f"{c:010d}" for c in ciks],
+                    "display_names": [f"{self.entities[(c - 1_000_000) // 7][2]}  (CIK {c:010d})" for c in ciks],
+                    "file_type": shown,
+                    "file_date": day.isoformat(),
+                    "adsh": accs,
+                    "form": "10-K",
+                },
+            })
+
+        return hits
+
+    def efts_page(self, query):
+        """ one search-index page for a parsed query string ({key: [values]}) """
+
+        file_types = ",".join(query.get("fileType", [""])).split(",")
+        start = datetime.date.fromisoformat(query.get("startdt", [f"{self.start}-01-01"])[0])
+        end = datetime.date.fromisoformat(query.get("enddt", [f"{self.end}-12-31"])[0])
+        offset = int(query.get("from", ["0"])[0])
+
+        days = []
+        day = start
+        while day <= end and day < self.today:
+            days.extend((ft, day) for ft in file_types if ft)
+            day += datetime.timedelta(days=1)
+
+        counts = [self._exhibit_count(ft, d) for ft, d in days]
+        total = sum(counts)
+
+        hits = []
+        seen = 0
+
+        if offset < self.MAX_HITS:
+            stop = min(offset + self.PAGE, self.MAX_HITS)
+
+            for (ft, d), n in zip(days, counts):
+                if seen + n > offset and seen < stop:
+                    hits.extend(self._exhibit_hits(ft, d)[max(0, offset - seen):stop - seen])
+                seen += n
+                if seen >= stop:
+                    break
+
+        return json.dumps({
+            "hits": {
+                "total": {"value": min(total, self.MAX_HITS), "relation": "gte" if total > self.MAX_HITS else "eq"},
+                "hits": hits,
+            }
+        })
+
+    def exhibit_subsidiaries(self, accs, doc):
+        """ [(name, jurisdiction, ownership %)] listed by one exhibit -- what exhibit_doc() renders """
+
+        rnd = self._rnd("ex21", accs, doc)
+        rows = []
+
+        for _ in range(rnd.randint(2, 40)):
+            if rnd.random() < 0.5:
+                # another EDGAR filer -- resolvable by name
+                name = self.entities[self._pick(rnd, self._issuers)][2]
+            else:
+                name = f"{' '.join(rnd.sample(self.WORDS, rnd.randint(1, 3))).title()} {rnd.choice(('LLC', 'Inc.', 'Ltd.', 'L.P.', 'GmbH', 'B.V.'))}"
+
+            ownership = rnd.choice((None, None, 100.0, 100.0, 51.0, 80.5))
+            rows.append((name, rnd.choice(self.JURISDICTIONS), ownership))
+
+        return rows
+
+    def exhibit_doc(self, accs, doc):
+        """ EX-21 document: an html table (mostly), a <pre> list or a plain text list """
+
+        rnd = self._rnd("ex21-doc", accs, doc)
+        rows = self.exhibit_subsidiaries(accs, doc)
+        style = rnd.choice(("table", "table", "table", "pre", "text"))
+        pct = any(o is not None for _, _, o in rows)
+
+        if style == "text":
+            lines = ["EXHIBIT 21.1", "", "SUBSIDIARIES OF THE REGISTRANT", ""]
+            for name, jurisdiction, ownership in rows:
+                line = rnd.choice((f"{name} ({jurisdiction})", f"{name:<50}{jurisdiction}",
+                                   f"{name} {'.' * 10} {jurisdiction}"))
+                lines.append(line + (f"   {ownership:g}%" if ownership is not None else ""))
+            return "\n".join(lines) + "\n"
+
+        out = ["<html><body>", "<p style=\"text-align:center\"><b>Exhibit 21.1</b></p>",
+               "<p>Subsidiaries of the Registrant</p>"]
+
+        if style == "pre":
+            out.append("<pre>")
+            out.extend(f"{name.replace('&', '&amp;')}, a {jurisdiction} entity" + (f"  {o:g}%" if o is not None else "")
+                       for name, jurisdiction, o in rows)
+            out.append("</pre>")
+
+        else:
+            out.append("<table>")
+            out.append("<tr><td><p><b>Name of Subsidiary</b></p></td><td><b>Jurisdiction of Organization</b></td>"
+                       + ("<td colspan=\"2\"><b>Percent Owned</b></td>" if pct else "") + "</tr>")
+
+            for name, jurisdiction, ownership in rows:
+                cells = [f"<td><p><font size=\"2\">{name.replace('&', '&amp;')}</font></p></td>", f"<td>{jurisdiction}&nbsp;</td>"]
+                if pct:
+                    cells.append(f"<td>{ownership:g}</td><td>%</td>" if ownership is not None else "<td>&nbsp;</td><td></td>")
+                out.append("<tr>" + "".join(cells) + "</tr>")
+
+            out.append("</table>")
+
+        out.append("</body></html>")
+        return "\n".join(out)
+
+    # ------------------------------------------------------------- routing
+
+    def get(self, path):
+        """ body (str | bytes) of a path below the stand-in's base url, None == 404 """
+
+        path, _, qs = path.partition("?")
+        parts = path.split("/")
+
+        if path == "LATEST/search-index":
+            return self.efts_page(urllib.parse.parse_qs(qs))
+
+        if len(parts) == 4 and parts[0] == "data" and len(parts[2]) == 18:
+            # data/<cik>/<accession without dashes>/<document> -- any filer of the filing
+            a = parts[2]
+            return self.exhibit_doc(f"{a[:10]}-{a[10:12]}-{a[12:]}", parts[3])
+
+        if len(parts) != 4 or parts[0] not in ("daily-index", "full-index") or not parts[2].startswith("QTR"):
+            return None
+
+        try:
+            year, quarter = int(parts[1]), int(parts[2][3:])
+        except ValueError:
+            return None
+
+        if not (self.start <= year <= self.end and 1 <= quarter <= 4):
+            return None
+
+        if parts[0] == "full-index":
+            return self.full_idx(year, quarter) if parts[3] == "company.gz" and self._is_closed(year, quarter) else None
+
+        days = self.business_days(year, quarter)
+
+        if not days:
+            return None
+
+        if parts[3] == "":
+            return listing_html([f"company.{d.strftime('%Y%m%d')}.idx" for d in days])
+
+        for d in days:
+            if parts[3] == f"company.{d.strftime('%Y%m%d')}.idx":
+                return self.daily_idx(d)
+
+        return None
@@ -0,0 +1,179 @@
+"""
+
+ Spill-to-disk for bounded-memory ParserIDX runs (see ParserIDX(memory_budget=...)).
+
+ Once small_db passes the budget it is written out as a *run*: all its CIKs sorted
+ ascending, one record per CIK
+
+    (cik, [original name, other names ...], entity, [(form type, YYYYMMDD, accession), ...])
+
+ and parsing continues with an empty store. Runs are written in parse order, so
+ merge_runs() -- an external k-way merge by CIK -- resolves every CIK exactly like the
+ in-memory store would: the earliest run's name wins, per form type the earliest-dated
+ filing (the earlier run's on a tie).
+
+ Run files are pickle streams of record batches, written atomically.
+
+"""
+
+import heapq
+import os
+import pickle
+import tempfile
+from collections.abc import Mapping
+from itertools import groupby
+from operator import itemgetter
+
+
+BATCH = 256     # records per pickle frame -- a merge holds one frame per run
+FAN_IN = 32     # runs merged at once, more are compacted first (see ParserIDX._spill)
+
+
+def store_records(store):
+    """ (cik, names, entity, filings) of an EntityStore, ascending CIK """
+
+    for row in sorted(range(len(store.ciks)), key=store.ciks.__getitem__):
+        cik = store.ciks[row]
+        names = [store.names[store.name_ids[row]]] + [store.names[i] for i in store.other.get(row, ())]
+        yield cik, names, store.entities[store.entity_codes[row]], store.filings(cik)
+
+
+def write_run(path, records):
+    """ records (sorted by CIK) -> run file, returns the number of records """
+
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+    n = 0
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            batch = []
+
+            for record in records:
+                batch.append(record)
+
+                if len(batch) >= BATCH:
+                    pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    n += len(batch)
+                    batch = []
+
+            if batch:
+                pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+                n += len(batch)
+
+        os.replace(tmp, path)
+
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    return n
+
+
+def read_run(path):
+    """ streams the records of a run file -- one batch in memory at a time """
+
+    with open(path, "rb", buffering=64 * 1024) as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+
+            yield from batch
+
+
+def combine(records):
+    """
+
+     Folds the records of one CIK (oldest run first) into one, as EntityStore.add()
+     / merge() would: first name stays the original, other names in first-seen order,
+     per form type the earliest-dated filing (the older run's on a tie), in date
+     order. The entity is dropped - classify again.
+
+    """
+
+    cik, names, _, filings = records[0]
+
+    if len(records) == 1:
+        return cik, names, None, filings
+
+    names = list(names)
+    seen_names = set(names)
+    kept = {f[0]: f for f in filings}
+
+    for _, more_names, _, more_filings in records[1:]:
+        for name in more_names:
+            if name not in seen_names:
+                seen_names.add(name)
+                names.append(name)
+
+        for filing in more_filings:
+            known = kept.get(filing[0])
+
+            if known is None or filing[1] < known[1]:
+                kept[filing[0]] = filing
+
+    return cik, names, None, sorted(kept.values(), key=itemgetter(1))
+
+
+def merge_runs(paths):
+    """ k-way merge of run files (oldest first) -> one combined record per CIK, ascending """
+
+    # heapq.merge is stable: equal CIKs come out in run order
+    merged = heapq.merge(*(read_run(p) for p in paths), key=itemgetter(0))
+
+    for _, group in groupby(merged, key=itemgetter(0)):
+        yield combine(list(group))
+
+
+class SpilledEntities(Mapping):
+    """
+
+     Read view over a merged (and classified) run file -- what parse() returns in
+     memory_budget mode. Iterating streams from disk; lookups by CIK are a scan.
+
+    """
+
+    def __init__(self, path, count):
+        self.path = path
+        self.count = count
+
+    @staticmethod
+    def _view(names, entity, filings):
+        return {
+            "original_name": names[0],
+            "other_names": names[1:],
+            "entity": entity,
+            "forms": [{"accs": accs, "filed": f"{filed:08d}", "type": ft} for ft, filed, accs in filings],
+        }
+
+    def records(self):
+        return read_run(self.path)
+
+    def items(self):
+        for cik, names, entity, filings in read_run(self.path):
+            yield str(cik), self._view(names, entity, filings)
+
+    def __getitem__(self, cik):
+        try:
+            cik = int(cik)
+        except (ValueError, TypeError):
+            raise KeyError(cik)
+
+        for c, names, entity, filings in read_run(self.path):
+            if c == cik:
+                return self._view(names, entity, filings)
+            if c > cik:
+                break
+
+        raise KeyError(cik)
+
+    def __iter__(self):
+        return (str(r[0]) for r in read_run(self.path))
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,392 @@
+import asyncio
+import gzip
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket - one bucket per request budget.
+
+    SEC allows 10 requests / second per client; the defaults keep us below that
+    even on a burst: any 1s window sees at most capacity + rate = 9 requests
+    (a full bucket plus one second of refill), so rate + capacity must stay < 10.
+    """
+
+    def __init__(self, rate=8.0, capacity=1):
+        """
+        Args:
+            rate (float): tokens added per second
+            capacity (int): max tokens held, i.e. the allowed burst
+        """
+
+        if rate <= 0:
+            raise Exception(f"TokenBucket rate must be positive, got: {rate}")
+
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+
+        self._tokens = float(self.capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def acquire(self, tokens=1):
+        """ blocks until `tokens` are available, then takes them """
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                wait = (tokens - self._tokens) / self.rate
+
+            # sleep outside the lock so other workers can refill / check too
+            time.sleep(wait)
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+
+     TokenBucket that backs off when the server throttles (AIMD):
+
+        throttled()  -- 429 / 503: rate halves, down to min_rate
+        succeeded()  -- every `recover_after` successes the rate grows by 10% of max_rate,
+                        up to max_rate again
+
+    """
+
+    def __init__(self, rate=8.0, capacity=1, min_rate=0.5, recover_after=20):
+        super().__init__(rate=rate, capacity=capacity)
+
+        self.max_rate = self.rate
+        self.min_rate = min(min_rate, self.rate)
+        self.recover_after = recover_after
+        self._streak = 0
+
+    def throttled(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._streak = 0
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate >= self.max_rate:
+                return
+
+            self._streak += 1
+
+            if self._streak >= self.recover_after:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+                self._streak = 0
+
+
+class Response:
+    """ what Request.fetch() returns -- status_code / content / headers / .text / .json() """
+
+    def __init__(self, status_code, content, headers, url):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="ignore")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpClient:
+    """
+
+     Pooled keep-alive HTTP client for sec.gov (stdlib only):
+
+        - one pool of idle connections per host, reused across threads
+        - gzip / deflate transfer, decoded before the body is returned
+        - User-Agent is mandatory (SEC fair access: "Company Name admin@company.com"),
+          taken from the argument or the SEC_USER_AGENT environment variable
+        - 429 / 5xx / connection errors are retried with jittered exponential backoff
+          (Retry-After wins if the server sends one)
+        - every attempt takes a token of one AdaptiveTokenBucket, which slows down on throttling
+
+     One instance per process is meant to be shared, see get_client().
+
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    THROTTLE_STATUS = (429, 503)
+
+    def __init__(self, user_agent=None, rate=8.0, retries=5, backoff=0.5, max_backoff=30.0,
+                 pool_size=16, timeout=30.0):
+        """
+        Args:
+            user_agent: required by the SEC - default: $SEC_USER_AGENT
+            rate: requests / second of the whole process (SEC cap is 10, keep rate + 1 below it)
+            retries: extra attempts after the first one
+            backoff: base seconds of the exponential backoff
+            pool_size: idle connections kept per host
+        """
+
+        self.user_agent = user_agent or os.environ.get("SEC_USER_AGENT")
+        self.limiter = AdaptiveTokenBucket(rate=rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._pools = {}            # (scheme, host, port) -> [idle connections]
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------- pool
+
+    def _checkout(self, key):
+        with self._lock:
+            idle = self._pools.get(key)
+            if idle:
+                return idle.pop()
+
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout)
+
+    def _checkin(self, key, conn):
+        with self._lock:
+            idle = self._pools.setdefault(key, [])
+
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+
+        for idle in pools.values():
+            for conn in idle:
+                conn.close()
+
+    # ------------------------------------------------------------- requests
+
+    def _once(self, url, headers):
+        """ one attempt on a pooled connection -> Response """
+
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+
+        conn = self._checkout(key)
+
+        try:
+            conn.request("GET", path, headers=headers)
+            r = conn.getresponse()
+            body = r.read()
+        except (OSError, http.client.HTTPException):
+            # stale keep-alive connection or network error -- never goes back to the pool
+            conn.close()
+            raise
+
+        response_headers = dict(r.getheaders())
+
+        if r.will_close:
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+        encoding = (r.getheader("Content-Encoding") or "").lower()
+
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+
+        return Response(r.status, body, response_headers, url)
+
+    def _wait(self, attempt, response=None):
+        retry_after = response is not None and response.headers.get("Retry-After")
+
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            # full jitter -- keeps parallel workers from retrying in lockstep
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+        time.sleep(delay)
+
+    def get(self, url, headers=None, redirects=5):
+        """ GET with retries -> Response (4xx other than 429 are returned, not raised) """
+
+        if not self.user_agent:
+            raise Exception("HttpClient needs a User-Agent (SEC fair access) - pass user_agent= or set SEC_USER_AGENT")
+
+        send = {"User-Agent": self.user_agent, "Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"}
+        send.update(headers or {})
+
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+
+            try:
+                response = self._once(url, send)
+            except (OSError, http.client.HTTPException) as E:
+                if attempt == self.retries:
+                    raise Exception(f"GET {url} failed after {attempt + 1} attempts: {E}")
+                self._wait(attempt)
+                continue
+
+            if response.status_code in self.THROTTLE_STATUS:
+                self.limiter.throttled()
+
+            if response.status_code in self.RETRY_STATUS and attempt < self.retries:
+                print(f"Warning: HTTP {response.status_code} for {url} - retry {attempt + 1}/{self.retries}")
+                self._wait(attempt, response)
+                continue
+
+            if response.status_code in (301, 302, 303, 307, 308) and redirects and response.headers.get("Location"):
+                return self.get(urllib.parse.urljoin(url, response.headers["Location"]), headers, redirects - 1)
+
+            if response.status_code < 400:
+                self.limiter.succeeded()
+
+            return response
+
+        return response
+
+    async def aget(self, url, headers=None):
+        """ async get() -- runs on a worker thread, same pool and budget as the sync calls """
+
+        return await asyncio.to_thread(self.get, url, headers)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """ the process-wide HttpClient (created on first use) """
+
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+
+    return _client
+
+
+def set_client(client):
+    """ swap the process-wide client, e.g. HttpClient(user_agent=..., rate=5) """
+
+    global _client
+
+    with _client_lock:
+        _client = client
+
+
+class Request:
+    """
+
+     Request(url).fetch(...) -- the wrapper both parsers call, backed by the shared client
+
+        fetch(as_json=False, headers=None)   -> Response (or the decoded json)
+        await afetch(...)                    -> same, async
+
+    """
+
+    def __init__(self, url):
+        self.url = url
+
+    def fetch(self, as_json=False, headers=None):
+        response = get_client().get(self.url, headers=headers)
+
+        if as_json:
+            if response.status_code >= 400:
+                raise Exception(f"HTTP {response.status_code} for {self.url}")
+            return response.json()
+
+        return response
+
+    async def afetch(self, as_json=False, headers=None):
+        return await asyncio.to_thread(self.fetch, as_json, headers)
+
+
+def timed_fetch(request_cls, url, limiter, stats, as_json=False, headers=None):
+    """
+
+     request_cls(url).fetch(...) behind an optional TokenBucket (limiter=None == the shared
+     client's budget only), timed into a RunStats ("fetch" stage + fetched bytes / seconds)
+     -- the one request path of the parsers
+
+    """
+
+    if limiter:
+        limiter.acquire()
+
+    with stats.stage("fetch"):
+        started = time.perf_counter()
+
+        if headers:
+            response = request_cls(url).fetch(as_json=as_json, headers=headers)
+        else:
+            response = request_cls(url).fetch(as_json=as_json)
+
+        body = getattr(response, "content", None)
+        stats.fetched(len(body) if isinstance(body, bytes) else None, time.perf_counter() - started)
+
+    return response
+
+
+def ordered_map(fn, items, workers):
+    """
+
+     Yields fn(item) for every item, in input order, while up to `workers` calls run
+     on a thread pool. Only a sliding window of workers * 2 results is in flight /
+     buffered, so a slow call early on does not make us hold hundreds of finished ones,
+     and items are pulled lazily. workers <= 1 == plain map.
+
+    """
+
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+
+    items = iter(items)
+    window = deque()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+
+        for item in items:
+            window.append(pool.submit(fn, item))
+
+            if len(window) >= workers * 2:
+                break
+
+        while window:
+            future = window.popleft()
+
+            # keep the pool busy before we block on the oldest one
+            for item in items:
+                window.append(pool.submit(fn, item))
+                break
+
+            yield future.result()